@@ -1,9 +1,19 @@
 """
 Clone of 2048 game.
+
+The GUI and numpy are imported only when used, so the game logic and
+players run headless.
 """
 
-import poc_2048_gui
+import argparse
+import collections
+import copy
+import json
+import platform
 import random
+import struct
+import sys
+import time
 
 # Directions, DO NOT MODIFY
 UP = 1
@@ -18,6 +28,9 @@ OFFSETS = {UP: (1, 0),
            LEFT: (0, 1),
            RIGHT: (0, -1)}
 
+# Chance that a new tile is a 4 rather than a 2
+FOUR_PROBABILITY = 0.1
+
 def merge(line):
     """
     Function that merges a single row or column in 2048.
@@ -37,31 +50,97 @@ def merge(line):
             result.append(0)
     return result
 
+def merge_points(line, merged):
+    """
+    Points scored when line merges into merged: the sum of the tiles
+    of merged that were formed by combining two tiles.
+    """
+    tiles = [num for num in line if num != 0]
+    points = 0
+    idx = 0
+    for num in merged:
+        if num == 0:
+            break
+        if tiles[idx] == num:
+            idx += 1
+        else:
+            points += num
+            idx += 2
+    return points
+
+# (height, width) -> {direction: lines of flat cell indices}, each line
+# listed from the edge the tiles slide towards
+_TRAVERSALS = {}
+
+def traversal_lines(grid_height, grid_width):
+    """
+    Return the flat index lines to merge for each direction on a board
+    of the given shape, where cell (row, col) is index row*width + col.
+    The tables are built once per shape and shared by every game.
+    """
+    shape = (grid_height, grid_width)
+    if shape not in _TRAVERSALS:
+        columns = [tuple(row * grid_width + col for row in range(grid_height))
+                   for col in range(grid_width)]
+        rows = [tuple(row * grid_width + col for col in range(grid_width))
+                for row in range(grid_height)]
+        _TRAVERSALS[shape] = {UP: columns,
+                              DOWN: [line[::-1] for line in columns],
+                              LEFT: rows,
+                              RIGHT: [line[::-1] for line in rows]}
+    return _TRAVERSALS[shape]
+
 class TwentyFortyEight:
     """
     Class to run the game logic.
     """
 
-    def __init__(self, grid_height, grid_width):
+    def __init__(self, grid_height, grid_width, seed=None, rng=None):
+        """
+        Tiles are drawn from rng when given, otherwise from a
+        random.Random seeded with seed (a fresh 64 bit seed when None),
+        so seeded games can be reproduced and replayed.
+        """
         self.grid_height = grid_height
         self.grid_width = grid_width
-        self.reset()
+        if rng is None:
+            if seed is None:
+                seed = random.getrandbits(64)
+            rng = random.Random(seed)
+        self._seed = seed
+        self._rng = rng
+        self._new_board()
         
     def reset(self):
         """
         Reset the game so the grid is empty except for two
-        initial tiles.
+        initial tiles.  A seeded game is re-seeded with a fresh seed
+        drawn from its generator, so the new game can be replayed
+        from get_seed() too.
+        """
+        if self._seed is not None:
+            self._seed = self._rng.getrandbits(64)
+            self._rng = random.Random(self._seed)
+        self._new_board()
+
+    def _new_board(self):
         """
-        self.grid = [[0 for col in range(self.grid_width)] for row in range(self.grid_height)]
-        # next, create a list of all tuples (row,col)
-        self.tiles = [(row,col) for row in range(self.grid_height) for col in range(self.grid_width)] 
+        Empty the grid and add the two initial tiles.
+        """
+        num_cells = self.grid_height * self.grid_width
+        # tiles in row major order, index row*width + col
+        self._cells = [0] * num_cells
+        # flat indices of the empty squares, and the slot of each square
+        # in that list (-1 when occupied)
+        self._empty = list(range(num_cells))
+        self._empty_pos = list(range(num_cells))
+        self._lines = traversal_lines(self.grid_height, self.grid_width)
+        self._score = 0
         for dummy_idx in range(2):
             self.new_tile()
-        self.dir_dic = {
-            UP:[(0, col) for col in range(self.grid_width)],
-            DOWN:[(self.grid_height-1, col) for col in range(self.grid_width)],
-            LEFT:[(row,0) for row in range(self.grid_height)], 
-            RIGHT:[(row,self.grid_width-1) for row in range(self.grid_height)]}
+        # True until the board changes, while a replay of the seed
+        # still rebuilds it
+        self._fresh = True
         
     def __str__(self):
         """
@@ -69,7 +148,8 @@ class TwentyFortyEight:
         """
         grid_str = ""
         for row in range(self.grid_height):
-            grid_str += str(self.grid[row])+'\n'
+            start = row * self.grid_width
+            grid_str += str(self._cells[start:start + self.grid_width])+'\n'
         return grid_str
 
     def get_grid_height(self):
@@ -84,67 +164,1017 @@ class TwentyFortyEight:
         """
         return self.grid_width
 
+    def get_score(self):
+        """
+        Get the points scored so far: the sum of every merged tile.
+        """
+        return self._score
+
+    def clone(self, rng=None):
+        """
+        Return a copy of the game.  The copy draws its tiles from rng
+        when given, otherwise from a copy of this game's generator.
+        Only a copy of a fresh game keeps the seed, as a replay of
+        the seed would not rebuild a game that has moved.
+        """
+        game = copy.copy(self)
+        game._cells = list(self._cells)
+        game._empty = list(self._empty)
+        game._empty_pos = list(self._empty_pos)
+        if rng is None:
+            game._rng = copy.deepcopy(self._rng)
+            if not self._fresh:
+                game._seed = None
+        else:
+            game._seed = None
+            game._rng = rng
+        return game
+
+    def get_seed(self):
+        """
+        Get the seed of the tile generator, or None for an injected one.
+        """
+        return self._seed
+
+    def is_fresh(self):
+        """
+        Return True while the board is as its seed set it up, before
+        any move or set_tile, so a replay recorded from here on
+        rebuilds the game.
+        """
+        return self._fresh
+
     def move(self, direction):
         """
         Move all tiles in the given direction and add
         a new tile if any tiles moved.
         """
+        self._fresh = False
         moved = False
-        initial_tiles = self.dir_dic[direction]
-        offset = OFFSETS[direction]
-        if direction == UP or direction == DOWN:
-            bound = self.grid_height
-        else:
-            bound = self.grid_width
-        for tile in initial_tiles:
-            temp = [self.get_tile(tile[0] + idx*offset[0], tile[1] + idx*offset[1]) 
-                    for idx in range(bound)]
-            temp = merge(temp)
-            
-            for idx in range(bound):
-                row = tile[0] + idx*offset[0]
-                col = tile[1] + idx*offset[1]
-                if self.get_tile(row, col) != temp[idx]:
-                    moved = True
-                self.set_tile(row, col, temp[idx]) 
+        cells = self._cells
+        empty = self._empty
+        empty_pos = self._empty_pos
+        for line in self._lines[direction]:
+            values = [cells[idx] for idx in line]
+            merged = merge(values)
+            if merged == values:
+                continue
+            moved = True
+            self._score += merge_points(values, merged)
+            for idx, value in zip(line, merged):
+                old = cells[idx]
+                if old == value:
+                    continue
+                cells[idx] = value
+                if value == 0:
+                    empty_pos[idx] = len(empty)
+                    empty.append(idx)
+                elif old == 0:
+                    # swap the last empty square into this one's slot
+                    slot = empty_pos[idx]
+                    last = empty.pop()
+                    if last != idx:
+                        empty[slot] = last
+                        empty_pos[last] = slot
+                    empty_pos[idx] = -1
         if moved:
             self.new_tile()
-    
+
+    def can_move(self, direction):
+        """
+        Return True if moving in the given direction would change the
+        board, without changing it: some tile has an empty square or
+        an equal tile next to it on the side it slides towards.
+        """
+        cells = self._cells
+        for line in self._lines[direction]:
+            for idx in range(len(line) - 1):
+                ahead = cells[line[idx]]
+                behind = cells[line[idx + 1]]
+                if behind != 0 and (ahead == 0 or ahead == behind):
+                    return True
+        return False
+
+    def legal_moves(self):
+        """
+        Return the list of directions that would change the board.
+        """
+        return [direction for direction in (UP, DOWN, LEFT, RIGHT)
+                if self.can_move(direction)]
+
+    def is_game_over(self):
+        """
+        Return True when no move can change the board.
+        """
+        if self._empty:
+            return False
+        # on a full board only equal neighbours can merge, and a pair
+        # that merges one way merges the opposite way too
+        return not (self.can_move(LEFT) or self.can_move(UP))
+
     def new_tile(self):
         """
         Create a new tile in a randomly selected empty
         square.  The tile should be 2 90% of the time and
-        4 10% of the time.
+        4 10% of the time.  Returns False, adding nothing,
+        when the board is full.
         """
-        random.shuffle(self.tiles) # shuffle the list of tiles tuples
-        count = 0
-        while self.get_tile(self.tiles[0][0], self.tiles[0][1]) != 0 and count < self.grid_height*self.grid_width: 
-            self.tiles.append(self.tiles.pop(0))            
+        if not self._empty:
+            return False
+        cell = self._rng.choice(self._empty)
+        row, col = divmod(cell, self.grid_width)
             
         # next, select value as 2 with a 90% probability (percentage) and 4 with 10%
-        percentage = random.random() 
-        if percentage > 0.1:
+        percentage = self._rng.random() 
+        if percentage > FOUR_PROBABILITY:
             value = 2
         else:
             value = 4
-        row = self.tiles[0][0]
-        col = self.tiles[0][1]
         self.set_tile(row , col,value) 
+        return True
+
+    def is_full(self):
+        """
+        Return True when no square is empty.
+        """
+        return not self._empty
 
     def set_tile(self, row, col, value):
         """
         Set the tile at position row, col to have the given value.
         """
-        self.grid[row][col] = value
+        self._fresh = False
+        cell = row * self.grid_width + col
+        self._cells[cell] = value
+        slot = self._empty_pos[cell]
+        if value == 0:
+            if slot < 0:
+                self._empty_pos[cell] = len(self._empty)
+                self._empty.append(cell)
+        elif slot >= 0:
+            # swap the last empty square into this one's slot
+            last = self._empty.pop()
+            if last != cell:
+                self._empty[slot] = last
+                self._empty_pos[last] = slot
+            self._empty_pos[cell] = -1
 
     def get_tile(self, row, col):
         """
         Return the value of the tile at position row, col.
         """
-        #print 'The value of tile at position: (',row,',',col,') is: ',self.grid[row][col]
-        return self.grid[row][col]
+        return self._cells[row * self.grid_width + col]
+
+###################################################################
+# Bitboard engine for 4x4 boards
+#
+# A board is a 64 bit integer holding the log2 of each tile (0 for an
+# empty square) in one nibble: tile (row, col) sits at bit 4*(4*row + col),
+# so each row is 16 bits with its column 0 in the low nibble.
+# Tiles are capped at 2**15 = 32768, the largest value a nibble holds.
+
+ROW_MASK = 0xFFFF
+
+# row -> row after sliding towards column 0 / column 3, and the points
+# scored sliding towards column 0, built on first use
+_ROW_LEFT = []
+_ROW_RIGHT = []
+_ROW_POINTS = []
+
+def _row_values(row):
+    """
+    Decode a 16 bit row into its four tile values.
+    """
+    return [(1 << ((row >> (4 * idx)) & 0xF)) & ~1 for idx in range(4)]
+
+def _row_code(values):
+    """
+    Encode four tile values as a 16 bit row.
+    """
+    row = 0
+    for idx, value in enumerate(values):
+        if value:
+            row |= min(value.bit_length() - 1, 15) << (4 * idx)
+    return row
+
+def build_row_tables():
+    """
+    Precompute the result of merging every possible row both ways,
+    using merge itself so the engine keeps its semantics.
+    """
+    if not _ROW_LEFT:
+        for row in range(ROW_MASK + 1):
+            values = _row_values(row)
+            merged = merge(values)
+            _ROW_LEFT.append(_row_code(merged))
+            _ROW_RIGHT.append(_row_code(merge(values[::-1])[::-1]))
+            _ROW_POINTS.append(merge_points(values, merged))
+
+def transpose(board):
+    """
+    Swap the rows and columns of a bitboard.
+    """
+    part1 = board & 0xF0F00F0FF0F00F0F
+    part2 = board & 0x0000F0F00000F0F0
+    part3 = board & 0x0F0F00000F0F0000
+    board = part1 | (part2 << 12) | (part3 >> 12)
+    part1 = board & 0xFF00FF0000FF00FF
+    part2 = board & 0x00FF00FF00000000
+    part3 = board & 0x00000000FF00FF00
+    return part1 | (part2 >> 24) | (part3 << 24)
+
+def encode_board(game):
+    """
+    Pack a 4x4 TwentyFortyEight grid into a bitboard.
+    """
+    rows = [_row_code([game.get_tile(row, col) for col in range(4)])
+            for row in range(4)]
+    return rows[0] | (rows[1] << 16) | (rows[2] << 32) | (rows[3] << 48)
+
+def decode_board(board):
+    """
+    Unpack a bitboard into a list of rows of tile values.
+    """
+    return [_row_values((board >> (16 * row)) & ROW_MASK) for row in range(4)]
+
+def bitboard_move(board, direction):
+    """
+    Slide and merge every line of a bitboard in the given direction,
+    without adding a new tile.  Returns the new bitboard, which equals
+    the old one when the move changes nothing.
+    """
+    build_row_tables()
+    if direction == UP or direction == DOWN:
+        board = transpose(board)
+    if direction == UP or direction == LEFT:
+        table = _ROW_LEFT
+    else:
+        table = _ROW_RIGHT
+    board = (table[board & ROW_MASK]
+             | (table[(board >> 16) & ROW_MASK] << 16)
+             | (table[(board >> 32) & ROW_MASK] << 32)
+             | (table[(board >> 48) & ROW_MASK] << 48))
+    if direction == UP or direction == DOWN:
+        board = transpose(board)
+    return board
+
+###################################################################
+# Game replays
+#
+# A replay is a header (magic, height, width, seed, move count) followed
+# by the moves packed four to a byte, two bits each (direction - UP),
+# first move in the low bits.
+
+REPLAY_MAGIC = b"2048"
+REPLAY_HEADER = "<4sHHQI"
+
+class ReplayRecorder:
+    """
+    Play a seeded game while writing its replay incrementally to an
+    open binary file.  The game must be fresh: just constructed or
+    reset, before any move.
+    """
+
+    def __init__(self, out, game):
+        if game.get_seed() is None:
+            raise ValueError("cannot replay an injected rng")
+        if not game.is_fresh():
+            raise ValueError("cannot replay a game that has moved since it was seeded")
+        self._out = out
+        self._game = game
+        self._count = 0
+        self._pending = 0
+        self._header_pos = out.tell()
+        out.write(struct.pack(REPLAY_HEADER, REPLAY_MAGIC, game.get_grid_height(),
+                              game.get_grid_width(), game.get_seed(), 0))
+
+    def move(self, direction):
+        """
+        Make the move in the game and record it.
+        """
+        self._game.move(direction)
+        self._pending |= (direction - UP) << (2 * (self._count % 4))
+        self._count += 1
+        if self._count % 4 == 0:
+            self._out.write(bytearray([self._pending]))
+            self._pending = 0
+
+    def close(self):
+        """
+        Write the last partial byte and the final move count.
+        """
+        if self._count % 4:
+            self._out.write(bytearray([self._pending]))
+            self._pending = 0
+        end = self._out.tell()
+        self._out.seek(self._header_pos)
+        self._out.write(struct.pack(REPLAY_HEADER, REPLAY_MAGIC, self._game.get_grid_height(),
+                                    self._game.get_grid_width(), self._game.get_seed(),
+                                    self._count))
+        self._out.seek(end)
+        self._out.flush()
+
+def read_replay(source):
+    """
+    Read a replay from an open binary file.  Returns a tuple
+    (height, width, seed, list of directions).
+    """
+    header = source.read(struct.calcsize(REPLAY_HEADER))
+    magic, height, width, seed, count = struct.unpack(REPLAY_HEADER, header)
+    assert magic == REPLAY_MAGIC, "not a 2048 replay"
+    packed = bytearray(source.read((count + 3) // 4))
+    moves = [((packed[idx // 4] >> (2 * (idx % 4))) & 3) + UP for idx in range(count)]
+    return (height, width, seed, moves)
+
+def replay_game(source, num_moves=None):
+    """
+    Rebuild a recorded game, stopping after num_moves moves when given.
+    Returns the TwentyFortyEight object.
+    """
+    height, width, seed, moves = read_replay(source)
+    game = TwentyFortyEight(height, width, seed)
+    for direction in moves[:num_moves]:
+        game.move(direction)
+    return game
+
+###################################################################
+# Expectimax player
+
+# Row heuristic weights
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+# row -> heuristic value of that row (or column), built on first use
+_ROW_HEURISTIC = []
+
+def build_heuristic_table():
+    """
+    Precompute the heuristic value of every possible row: empty squares
+    and merge opportunities count for a row, while large tiles and
+    breaks in monotonicity count against it.
+    """
+    if not _ROW_HEURISTIC:
+        for row in range(ROW_MASK + 1):
+            ranks = [(row >> (4 * idx)) & 0xF for idx in range(4)]
+            total = sum(rank ** SUM_POWER for rank in ranks)
+            empty = ranks.count(0)
+            merges = 0
+            previous = 0
+            counter = 0
+            for rank in ranks:
+                if rank == 0:
+                    continue
+                if previous == rank:
+                    counter += 1
+                elif counter > 0:
+                    merges += 1 + counter
+                    counter = 0
+                previous = rank
+            if counter > 0:
+                merges += 1 + counter
+            increasing = 0.0
+            decreasing = 0.0
+            for idx in range(3):
+                step = ranks[idx] ** MONOTONICITY_POWER - ranks[idx + 1] ** MONOTONICITY_POWER
+                if step > 0:
+                    increasing += step
+                else:
+                    decreasing -= step
+            _ROW_HEURISTIC.append(LOST_PENALTY + EMPTY_WEIGHT * empty
+                                  + MERGES_WEIGHT * merges
+                                  - MONOTONICITY_WEIGHT * min(increasing, decreasing)
+                                  - SUM_WEIGHT * total)
+
+def board_heuristic(board):
+    """
+    Heuristic value of a bitboard, summed over its rows and columns.
+    """
+    build_heuristic_table()
+    columns = transpose(board)
+    ans = 0.0
+    for shift in (0, 16, 32, 48):
+        ans += _ROW_HEURISTIC[(board >> shift) & ROW_MASK]
+        ans += _ROW_HEURISTIC[(columns >> shift) & ROW_MASK]
+    return ans
+
+class ExpectimaxPlayer:
+    """
+    Expectimax search over bitboards: the player picks the move with the
+    best expected heuristic value, new tiles arrive as in new_tile.
+    Chance nodes reached with probability below prob_threshold are
+    scored by the heuristic instead of searched, and chance node values
+    are kept in an LRU transposition table of cache_size boards.
+    """
+
+    def __init__(self, depth=3, prob_threshold=0.0001, cache_size=100000):
+        self._depth = depth
+        self._prob_threshold = prob_threshold
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._nodes = 0
+        self._lookups = 0
+        self._hits = 0
+        self._seconds = 0.0
+
+    def get_stats(self):
+        """
+        Return search statistics accumulated over every call so far.
+        """
+        nodes_per_second = 0.0
+        if self._seconds > 0:
+            nodes_per_second = self._nodes / self._seconds
+        hit_rate = 0.0
+        if self._lookups > 0:
+            hit_rate = float(self._hits) / self._lookups
+        return {"nodes": self._nodes, "seconds": self._seconds,
+                "nodes_per_second": nodes_per_second,
+                "cache_lookups": self._lookups, "cache_hits": self._hits,
+                "cache_hit_rate": hit_rate, "cache_entries": len(self._cache)}
+
+    def choose_move(self, game):
+        """
+        Pick the move for a 4x4 TwentyFortyEight game.  Returns one of
+        UP, DOWN, LEFT, RIGHT, or None when no move changes the board.
+        """
+        return self.choose_bitboard_move(encode_board(game))
+
+    def choose_bitboard_move(self, board):
+        """
+        Pick the move for a bitboard.  Returns a direction or None.
+        """
+        build_row_tables()
+        build_heuristic_table()
+        start = time.time()
+        best_move = None
+        best_value = -1.0
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            moved = bitboard_move(board, direction)
+            if moved == board:
+                continue
+            value = self._chance_node(moved, self._depth, 1.0)
+            if value > best_value:
+                best_move = direction
+                best_value = value
+        self._seconds += time.time() - start
+        return best_move
 
+    def _max_node(self, board, depth, prob):
+        """
+        Value of a board with the player to move.
+        """
+        self._nodes += 1
+        ans = 0.0
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            moved = bitboard_move(board, direction)
+            if moved != board:
+                ans = max(ans, self._chance_node(moved, depth, prob))
+        return ans
+
+    def _chance_node(self, board, depth, prob):
+        """
+        Expected value of a board just before a new tile appears.
+        """
+        self._nodes += 1
+        if depth <= 0 or prob < self._prob_threshold:
+            return board_heuristic(board)
+        self._lookups += 1
+        entry = self._cache.pop(board, None)
+        if entry is not None and entry[0] >= depth:
+            self._hits += 1
+            self._cache[board] = entry
+            return entry[1]
+        empty = [shift for shift in range(0, 64, 4) if not (board >> shift) & 0xF]
+        if not empty:
+            return board_heuristic(board)
+        prob /= len(empty)
+        ans = 0.0
+        for shift in empty:
+            ans += (1 - FOUR_PROBABILITY) * self._max_node(
+                board | (1 << shift), depth - 1, prob * (1 - FOUR_PROBABILITY))
+            ans += FOUR_PROBABILITY * self._max_node(
+                board | (2 << shift), depth - 1, prob * FOUR_PROBABILITY)
+        ans /= len(empty)
+        self._cache[board] = (depth, ans)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return ans
+
+###################################################################
+# Monte Carlo player
+
+def random_rollout(game, rng):
+    """
+    Play random legal moves until the game is over.  Returns the
+    points scored along the way.
+    """
+    start = game.get_score()
+    legal = game.legal_moves()
+    while legal:
+        game.move(rng.choice(legal))
+        legal = game.legal_moves()
+    return game.get_score() - start
+
+def rollout_batch(task):
+    """
+    Run a batch of rollouts after one move, for a process pool.  The
+    task is (height, width, cells, direction, rollouts, seed); each
+    batch has its own seeded generator, so its result does not depend
+    on which worker runs it.  Returns (direction, total score, rollouts).
+    """
+    height, width, cells, direction, rollouts, seed = task
+    rng = random.Random(seed)
+    base = TwentyFortyEight(height, width, rng=rng)
+    for cell, value in enumerate(cells):
+        base.set_tile(cell // width, cell % width, value)
+    total = 0
+    for dummy_idx in range(rollouts):
+        # each rollout makes the move itself, so it scores the merge and
+        # draws its own new tile whatever the batch size
+        game = base.clone(rng)
+        game.move(direction)
+        random_rollout(game, rng)
+        total += game.get_score()
+    return (direction, total, rollouts)
+
+class MonteCarloPlayer:
+    """
+    Pick the legal move with the best average score over random
+    rollouts, rollouts per move in batches of batch_size spread over a
+    pool of processes (run in this process when processes is 0).
+    With a time_budget in seconds, no new round of batches starts once
+    the budget for a move is spent.
+    """
+
+    def __init__(self, rollouts=100, time_budget=None, processes=None,
+                 batch_size=10, seed=None):
+        self._rollouts = rollouts
+        self._time_budget = time_budget
+        self._processes = processes
+        self._batch_size = batch_size
+        self._rng = random.Random(seed)
+        self._pool = None
+        self._played = 0
+        self._seconds = 0.0
+
+    def get_stats(self):
+        """
+        Return rollout statistics accumulated over every call so far.
+        """
+        rollouts_per_second = 0.0
+        if self._seconds > 0:
+            rollouts_per_second = self._played / self._seconds
+        return {"rollouts": self._played, "seconds": self._seconds,
+                "rollouts_per_second": rollouts_per_second}
+
+    def close(self):
+        """
+        Shut down the process pool, if one was started.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _run_batches(self, tasks):
+        """
+        Run rollout batches in the pool, or here with no pool.
+        """
+        if self._processes == 0:
+            return [rollout_batch(task) for task in tasks]
+        if self._pool is None:
+            import multiprocessing
+            self._pool = multiprocessing.Pool(self._processes)
+        return self._pool.imap_unordered(rollout_batch, tasks)
+
+    def choose_move(self, game):
+        """
+        Pick the move for a TwentyFortyEight game.  Returns one of
+        UP, DOWN, LEFT, RIGHT, or None when no move changes the board.
+        """
+        legal = game.legal_moves()
+        if len(legal) < 2:
+            return legal[0] if legal else None
+        start = time.time()
+        cells = [game.get_tile(row, col) for row in range(game.get_grid_height())
+                 for col in range(game.get_grid_width())]
+        totals = dict((direction, 0) for direction in legal)
+        counts = dict((direction, 0) for direction in legal)
+        remaining = self._rollouts
+        while remaining > 0:
+            size = min(self._batch_size, remaining)
+            tasks = [(game.get_grid_height(), game.get_grid_width(), cells,
+                      direction, size, self._rng.getrandbits(64))
+                     for direction in legal]
+            for direction, total, rollouts in self._run_batches(tasks):
+                totals[direction] += total
+                counts[direction] += rollouts
+                self._played += rollouts
+            remaining -= size
+            if self._time_budget is not None and time.time() - start >= self._time_budget:
+                break
+        self._seconds += time.time() - start
+        return max(legal, key=lambda direction: float(totals[direction]) / counts[direction])
+
+###################################################################
+# Vectorized batch simulator
+
+# numpy copies of the row tables (codes, decoded lines, points), built
+# on first use
+_NUMPY_TABLES = []
+
+def _numpy_tables():
+    """
+    Return numpy versions of the left row tables: the merged row code,
+    the merged row as four ranks, and the points, for every row code.
+    """
+    import numpy
+    if not _NUMPY_TABLES:
+        build_row_tables()
+        codes = numpy.array(_ROW_LEFT, dtype=numpy.int64)
+        _NUMPY_TABLES.append(codes)
+        _NUMPY_TABLES.append(((codes[:, None] >> (4 * numpy.arange(4))) & 0xF).astype(numpy.uint8))
+        _NUMPY_TABLES.append(numpy.array(_ROW_POINTS, dtype=numpy.int64))
+    return _NUMPY_TABLES
+
+def _leftward(ranks, direction, undo=False):
+    """
+    View a numpy array of boards so that the given direction becomes a
+    slide towards column 0, or undo such a view.
+    """
+    if undo and (direction == RIGHT or direction == DOWN):
+        ranks = ranks[:, :, ::-1]
+    if direction == UP or direction == DOWN:
+        ranks = ranks.transpose(0, 2, 1)
+    if not undo and (direction == RIGHT or direction == DOWN):
+        ranks = ranks[:, :, ::-1]
+    return ranks
+
+def _line_codes(lines):
+    """
+    Pack each line of up to four ranks into a 16 bit row code.
+    """
+    import numpy
+    codes = lines[:, :, 0].astype(numpy.int64)
+    for idx in range(1, lines.shape[2]):
+        codes |= lines[:, :, idx].astype(numpy.int64) << (4 * idx)
+    return codes
+
+def slide_boards(ranks, direction):
+    """
+    Slide and merge a numpy array of boards (games x rows x columns)
+    holding the log2 of each tile, 0 for empty squares, with the
+    semantics of merge and without adding new tiles.  Lines of up to
+    four tiles go through the bitboard row tables.  Returns the new
+    boards and the points each game scored (the sum of merged tiles).
+    """
+    import numpy
+    lines = _leftward(ranks, direction)
+    length = lines.shape[2]
+    if length <= 4:
+        dummy_codes, decoded, points = _numpy_tables()
+        codes = _line_codes(lines)
+        points = points[codes].sum(axis=1)
+        lines = decoded[codes][:, :, :length]
+    else:
+        order = numpy.argsort(lines == 0, axis=2, kind="stable")
+        lines = numpy.take_along_axis(lines, order, axis=2)
+        points = numpy.zeros(len(lines), dtype=numpy.int64)
+        for idx in range(length - 1):
+            same = (lines[:, :, idx] == lines[:, :, idx + 1]) & (lines[:, :, idx] != 0)
+            lines[:, :, idx] += same
+            lines[:, :, idx + 1] *= ~same
+            points += ((numpy.int64(1) << lines[:, :, idx]) * same).sum(axis=1)
+        order = numpy.argsort(lines == 0, axis=2, kind="stable")
+        lines = numpy.take_along_axis(lines, order, axis=2)
+    return numpy.ascontiguousarray(_leftward(lines, direction, True)), points
+
+def moves_change(ranks, direction):
+    """
+    Tell, for each board of a numpy array of log2 ranks, whether a move
+    in the given direction would change it.  Returns a boolean array.
+    """
+    lines = _leftward(ranks, direction)
+    if lines.shape[2] <= 4:
+        codes = _line_codes(lines)
+        return (_numpy_tables()[0][codes] != codes).any(axis=1)
+    return (slide_boards(ranks, direction)[0] != ranks).any(axis=(1, 2))
+
+def random_policy(rng):
+    """
+    Make a BatchSimulator policy that picks a legal move uniformly at
+    random for every game, drawing from the given numpy Generator.
+    """
+    def policy(dummy_boards, legal):
+        """
+        Choose among the legal moves of each game.
+        """
+        keys = rng.random(legal.shape) * legal
+        return keys.argmax(axis=1) + UP
+    return policy
+
+class BatchSimulator:
+    """
+    Many independent games played in lockstep, stored as a numpy array
+    (games x rows x columns) of log2 tile ranks with numpy random spawns.
+    """
+
+    def __init__(self, num_games, grid_height=4, grid_width=4, seed=None):
+        import numpy
+        self._rng = numpy.random.default_rng(seed)
+        self.ranks = numpy.zeros((num_games, grid_height, grid_width), dtype=numpy.uint8)
+        self.scores = numpy.zeros(num_games, dtype=numpy.int64)
+        self.moves = numpy.zeros(num_games, dtype=numpy.int64)
+        self.alive = numpy.ones(num_games, dtype=bool)
+        everyone = numpy.arange(num_games)
+        for dummy_idx in range(2):
+            self._spawn(everyone)
+
+    def _spawn(self, games):
+        """
+        Add a 2 or 4 to a random empty square of each listed game.
+        """
+        import numpy
+        if len(games) == 0:
+            return
+        flat = self.ranks[games].reshape(len(games), -1)
+        keys = self._rng.random(flat.shape)
+        keys[flat != 0] = -1.0
+        cells = keys.argmax(axis=1)
+        values = 1 + (self._rng.random(len(games)) <= FOUR_PROBABILITY)
+        has_room = keys[numpy.arange(len(games)), cells] >= 0
+        games = games[has_room]
+        cells = cells[has_room]
+        width = self.ranks.shape[2]
+        self.ranks[games, cells // width, cells % width] = values[has_room]
+
+    def get_boards(self):
+        """
+        Return the tile values of every game as a numpy array.
+        """
+        import numpy
+        return (numpy.int64(1) << self.ranks) * (self.ranks > 0)
+
+    def step(self, policy):
+        """
+        Advance every live game by one move chosen by policy, which is
+        called with the live boards (as log2 ranks) and a (games x 4)
+        array telling which of UP, DOWN, LEFT, RIGHT change each board,
+        and returns one direction per live game.  Games with no legal
+        move end.
+        Returns the number of games still alive.
+        """
+        import numpy
+        games = numpy.flatnonzero(self.alive)
+        boards = self.ranks[games]
+        legal = numpy.stack([moves_change(boards, direction)
+                             for direction in (UP, DOWN, LEFT, RIGHT)], axis=1)
+        over = ~legal.any(axis=1)
+        self.alive[games[over]] = False
+        games = games[~over]
+        boards = boards[~over]
+        legal = legal[~over]
+        if len(games) == 0:
+            return 0
+        choice = numpy.asarray(policy(boards, legal))
+        changed = legal[numpy.arange(len(games)), choice - UP]
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            chosen = (choice == direction) & changed
+            if chosen.any():
+                moved, points = slide_boards(boards[chosen], direction)
+                self.ranks[games[chosen]] = moved
+                self.scores[games[chosen]] += points
+        self.moves[games] += changed
+        self._spawn(games[changed])
+        return len(games)
+
+    def run(self, policy=None, max_steps=None):
+        """
+        Step every game until all are over (or max_steps steps), by
+        default with random_policy.  Returns a dictionary of per game
+        numpy arrays: scores, max tiles and moves made.
+        """
+        if policy is None:
+            policy = random_policy(self._rng)
+        steps = 0
+        while self.alive.any() and (max_steps is None or steps < max_steps):
+            self.step(policy)
+            steps += 1
+        return {"scores": self.scores.copy(),
+                "max_tiles": self.get_boards().max(axis=(1, 2)),
+                "moves": self.moves.copy()}
+
+###################################################################
+# Benchmarks
+
+BENCHMARK_LINE_LENGTHS = [4, 8, 16, 32, 64]
+BENCHMARK_SHAPES = [(4, 4), (8, 8), (16, 16), (32, 32), (64, 64)]
+BENCHMARK_GAME_SHAPES = [(4, 4), (6, 6)]
+
+def random_line(length, rng, fill=0.5):
+    """
+    Return a line of small random tiles, each square filled with
+    probability fill.
+    """
+    return [2 ** rng.randint(1, 5) if rng.random() < fill else 0
+            for dummy_idx in range(length)]
+
+def random_game(grid_height, grid_width, rng, fill=0.5):
+    """
+    Return a game whose board is filled like random_line, with tiles drawn from
+    rng, and whose later tiles come from a generator seeded from rng.
+    """
+    game = TwentyFortyEight(grid_height, grid_width, rng.getrandbits(64))
+    cells = random_line(grid_height * grid_width, rng, fill)
+    for cell, value in enumerate(cells):
+        game.set_tile(cell // grid_width, cell % grid_width, value)
+    return game
+
+def bench_merges(lengths, rng, count):
+    """
+    Time merge on count random lines of each length.
+    """
+    ans = []
+    for length in lengths:
+        lines = [random_line(length, rng) for dummy_idx in range(count)]
+        start = time.time()
+        for line in lines:
+            merge(line)
+        seconds = time.time() - start
+        ans.append({"length": length, "merges": count, "seconds": seconds,
+                    "merges_per_second": count / max(seconds, 1e-9)})
+    return ans
+
+def bench_moves(shapes, rng, count):
+    """
+    Time one move, in turn in each direction, on count random boards
+    of each shape.  Board setup is not timed.
+    """
+    ans = []
+    for grid_height, grid_width in shapes:
+        games = [random_game(grid_height, grid_width, rng) for dummy_idx in range(count)]
+        start = time.time()
+        for idx, game in enumerate(games):
+            game.move(UP + idx % 4)
+        seconds = time.time() - start
+        ans.append({"height": grid_height, "width": grid_width, "moves": count,
+                    "seconds": seconds, "moves_per_second": count / max(seconds, 1e-9)})
+    return ans
+
+def bench_games(shapes, rng, count):
+    """
+    Play count whole games of each shape choosing uniformly among the
+    legal moves.
+    """
+    ans = []
+    for grid_height, grid_width in shapes:
+        moves = 0
+        scores = []
+        start = time.time()
+        for dummy_idx in range(count):
+            game = TwentyFortyEight(grid_height, grid_width, rng.getrandbits(64))
+            legal = game.legal_moves()
+            while legal:
+                game.move(rng.choice(legal))
+                moves += 1
+                legal = game.legal_moves()
+            scores.append(game.get_score())
+        seconds = time.time() - start
+        ans.append({"height": grid_height, "width": grid_width, "games": count,
+                    "moves": moves, "seconds": seconds,
+                    "games_per_second": count / max(seconds, 1e-9),
+                    "moves_per_second": moves / max(seconds, 1e-9),
+                    "score_mean": float(sum(scores)) / count})
+    return ans
+
+def _trace_moves(games, move):
+    """
+    Call move(game, direction) on each game, in turn in each direction,
+    under tracemalloc.  Returns (blocks, peak bytes): the blocks
+    allocated by this module and still held after the batch, and the
+    sum over the calls of the peak bytes above the level before each.
+    tracemalloc only sees the blocks alive at a snapshot, so blocks
+    allocated and freed within a move are not counted; they only show
+    in the peak.
+    """
+    import tracemalloc
+    module_only = [tracemalloc.Filter(True, __file__)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot().filter_traces(module_only)
+    peak_total = 0
+    for idx, game in enumerate(games):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        move(game, UP + idx % 4)
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    after = tracemalloc.take_snapshot().filter_traces(module_only)
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename")
+                 if stat.count_diff > 0)
+    return (blocks, peak_total)
+
+def _no_move(game, direction):
+    """
+    Stand-in for TwentyFortyEight.move, measuring the tracing overhead.
+    """
+    return (game, direction)
+
+def bench_allocations(shapes, rng, count):
+    """
+    Trace memory over count moves on random boards of each shape:
+    blocks allocated by this module and retained after the moves, and
+    the peak bytes allocated during a move, each less the same figure
+    for a call that does nothing.  The retained blocks are not a count
+    of allocations: the temporaries of a move are freed before it
+    returns and only add to the peak.  Needs Python 3.9 or later.
+    """
+    ans = []
+    for grid_height, grid_width in shapes:
+        games = [random_game(grid_height, grid_width, rng) for dummy_idx in range(count)]
+        base_blocks, base_peak = _trace_moves(games, _no_move)
+        blocks, peak_total = _trace_moves(games, TwentyFortyEight.move)
+        ans.append({"height": grid_height, "width": grid_width, "moves": count,
+                    "retained_blocks_per_move": float(blocks - base_blocks) / count,
+                    "peak_bytes_per_move": float(peak_total - base_peak) / count})
+    return ans
+
+def run_benchmark(line_lengths=None, shapes=None, game_shapes=None,
+                  count=1000, games=20, seed=0):
+    """
+    Run every benchmark from one seeded generator.  Returns a JSON
+    ready dictionary with one list of records per benchmark.
+    """
+    if line_lengths is None:
+        line_lengths = BENCHMARK_LINE_LENGTHS
+    if shapes is None:
+        shapes = BENCHMARK_SHAPES
+    if game_shapes is None:
+        game_shapes = BENCHMARK_GAME_SHAPES
+    rng = random.Random(seed)
+    return {"python": platform.python_version(), "seed": seed,
+            "merge": bench_merges(line_lengths, rng, count),
+            "move": bench_moves(shapes, rng, count),
+            "game": bench_games(game_shapes, rng, games),
+            "allocations": bench_allocations(shapes, rng, max(count // 10, 1))}
+
+###################################################################
+# Command line interface
+
+def run_gui(game):
+    """
+    Start the interactive game for the given TwentyFortyEight object.
+    """
+    import poc_2048_gui
+    poc_2048_gui.run_gui(game)
+
+def parse_size(text):
+    """
+    Parse a board size written as HEIGHTxWIDTH.  Returns a tuple of
+    two integers.
+    """
+    height, width = text.lower().split("x")
+    return (int(height), int(width))
+
+def main(argv=None):
+    """
+    Command line entry point: run the benchmarks, or start the GUI
+    when no command is given.
+    """
+    parser = argparse.ArgumentParser(description="2048")
+    commands = parser.add_subparsers(dest="command")
+    bench = commands.add_parser("bench", help="run the merge and move benchmarks")
+    bench.add_argument("--lengths", nargs="+", type=int)
+    bench.add_argument("--shapes", nargs="+", type=parse_size)
+    bench.add_argument("--game-shapes", nargs="+", type=parse_size)
+    bench.add_argument("--count", type=int, default=1000,
+                       help="lines and boards timed per length or shape")
+    bench.add_argument("--games", type=int, default=20, help="games played per shape")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("-o", "--output", help="JSON report (default stdout)")
+    gui = commands.add_parser("gui", help="start the interactive game")
+    gui.add_argument("size", nargs="?", type=parse_size, default=(4, 4))
+    gui.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        report = run_benchmark(args.lengths, args.shapes, args.game_shapes,
+                               args.count, args.games, args.seed)
+        if args.output:
+            with open(args.output, "w") as out:
+                json.dump(report, out, indent=1)
+        else:
+            json.dump(report, sys.stdout, indent=1)
+            sys.stdout.write("\n")
+    elif args.command == "gui":
+        run_gui(TwentyFortyEight(args.size[0], args.size[1], args.seed))
+    else:
+        run_gui(TwentyFortyEight(4, 4))
 
-poc_2048_gui.run_gui(TwentyFortyEight(4, 4))
+if __name__ == "__main__":
+    main()
 
 
@@ -2,9 +2,299 @@
 Loyd's Fifteen puzzle - solver and visualizer
 Note that solved configuration has the blank (zero) tile in upper left
 Use the arrows key to swap this tile with its neighbors
+
+The GUI and the batch/benchmark dependencies are imported only when
+used, so headless workers can import the solver cheaply; run the module
+with --help for the command line interface
 """
 
-import poc_fifteen_gui
+from array import array
+import argparse
+import bisect
+import collections
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+# Blank moves in terms of (row, col) offsets, and the move undoing each one
+MOVES = {"l": (0, -1), "r": (0, 1), "u": (-1, 0), "d": (1, 0)}
+INVERSE = {"l": "r", "r": "l", "u": "d", "d": "u"}
+
+# compress_moves lookup tries, by window size
+_SHORTCUTS = {}
+
+# distance_table results by board size, and the largest board it accepts
+_DISTANCES = {}
+TABLE_MAX_CELLS = 9
+
+def neighbor_cells(puzzle_height, puzzle_width):
+    """
+    List the blank moves available from every cell of a board
+    Returns a list, indexed by cell, of (direction, target cell) pairs
+    in direction order
+    """
+    ans = []
+    for cell in range(puzzle_height * puzzle_width):
+        row, col = divmod(cell, puzzle_width)
+        ans.append([(direction, (row + offset[0]) * puzzle_width + col + offset[1])
+                    for direction, offset in sorted(MOVES.items())
+                    if 0 <= row + offset[0] < puzzle_height
+                    and 0 <= col + offset[1] < puzzle_width])
+    return ans
+
+def line_conflicts(goals):
+    """
+    Count the tiles that must leave a row (or column) so that the
+    remaining tiles appear in the order of their goal positions,
+    given the goal positions of the tiles that belong to that line
+    Returns an integer
+    """
+    tails = []
+    for goal in goals:
+        idx = bisect.bisect_left(tails, goal)
+        if idx == len(tails):
+            tails.append(goal)
+        else:
+            tails[idx] = goal
+    return len(goals) - len(tails)
+
+def count_inversions(values):
+    """
+    Count the pairs of values that appear in decreasing order, for a
+    permutation of range(len(values)), using a Fenwick tree
+    Returns an integer
+    """
+    size = len(values)
+    tree = [0] * (size + 1)
+    ans = 0
+    for idx, value in enumerate(values):
+        # earlier values no larger than this one
+        pos = value + 1
+        smaller = 0
+        while pos > 0:
+            smaller += tree[pos]
+            pos -= pos & -pos
+        ans += idx - smaller
+        pos = value + 1
+        while pos <= size:
+            tree[pos] += 1
+            pos += pos & -pos
+    return ans
+
+def move_effect(moves):
+    """
+    Simulate a move string on an unbounded board with the blank
+    starting at (0, 0)
+    Returns a tuple (key, box) where key identifies the final blank
+    cell and every displaced tile, so two strings with equal keys are
+    interchangeable, and box = (min row, max row, min col, max col)
+    bounds the cells the blank visits
+    """
+    row, col = 0, 0
+    box = [0, 0, 0, 0]
+    # cell -> starting cell of the tile now there, for cells the blank left
+    origin = {}
+    for direction in moves:
+        target = (row + MOVES[direction][0], col + MOVES[direction][1])
+        origin[(row, col)] = origin.pop(target, target)
+        row, col = target
+        box = [min(box[0], row), max(box[1], row), min(box[2], col), max(box[3], col)]
+    displaced = frozenset((cell, start) for cell, start in origin.items() if start != cell)
+    return ((row, col), displaced), tuple(box)
+
+def shortcut_table(max_window):
+    """
+    Search every string of at most max_window moves that never undoes
+    its previous move, for strings with a shorter equivalent whose blank
+    stays inside the box the original visits (so it is legal wherever
+    the original was)
+    Returns a dictionary mapping each such string to its replacement
+    """
+    # effect key -> [(string, box)] for strings with no shortcut
+    shortest = {}
+    ans = {}
+    layer = [""]
+    shortest[move_effect("")[0]] = [("", (0, 0, 0, 0))]
+    for dummy_length in range(max_window):
+        next_layer = []
+        for prefix in layer:
+            for direction in "lrud":
+                if prefix and prefix[-1] == INVERSE[direction]:
+                    continue
+                moves = prefix + direction
+                key, box = move_effect(moves)
+                candidates = shortest.setdefault(key, [])
+                for short, short_box in candidates:
+                    if (short_box[0] >= box[0] and short_box[1] <= box[1]
+                            and short_box[2] >= box[2] and short_box[3] <= box[3]):
+                        ans[moves] = short
+                        break
+                else:
+                    candidates.append((moves, box))
+                    next_layer.append(moves)
+        layer = next_layer
+    return ans
+
+def compress_moves(moves, max_window=8):
+    """
+    Shorten a move string in one pass: moves undone by the next move
+    cancel, and any trailing run of up to max_window moves with a
+    shorter equivalent in shortcut_table is replaced (the replacement
+    is fed back through the same pass, so every step shrinks the output)
+    Returns a string with the same effect on any board it is legal on
+    """
+    if max_window not in _SHORTCUTS:
+        # trie over reversed strings, so output suffixes can be matched
+        trie = {}
+        for long_moves, short in shortcut_table(max_window).items():
+            node = trie
+            for direction in reversed(long_moves):
+                node = node.setdefault(direction, {})
+            node[""] = short
+        _SHORTCUTS[max_window] = trie
+    trie = _SHORTCUTS[max_window]
+
+    ans = []
+    pending = []
+    idx = 0
+    while pending or idx < len(moves):
+        if pending:
+            direction = pending.pop()
+        else:
+            direction = moves[idx]
+            idx += 1
+        if ans and ans[-1] == INVERSE[direction]:
+            ans.pop()
+            continue
+        ans.append(direction)
+        node = trie
+        length = 0
+        while length < len(ans):
+            node = node.get(ans[-1 - length])
+            if node is None:
+                break
+            length += 1
+            if "" in node:
+                del ans[-length:]
+                pending.extend(reversed(node[""]))
+                break
+    return "".join(ans)
+
+def distance_table(puzzle_height, puzzle_width):
+    """
+    BFS from the solved board over every reachable state of a small
+    board, computed once per size and kept for the process
+    Returns a bytearray indexed by rank_cells of the row-major cell
+    values, holding the distance to solved (255 when unreachable)
+    """
+    shape = (puzzle_height, puzzle_width)
+    if shape in _DISTANCES:
+        return _DISTANCES[shape]
+    size = puzzle_height * puzzle_width
+    assert size <= TABLE_MAX_CELLS, "board too large for a distance table"
+    neighbors = neighbor_cells(puzzle_height, puzzle_width)
+    entries = 1
+    for idx in range(2, size + 1):
+        entries *= idx
+    ans = bytearray(b"\xff") * entries
+    layer = [list(range(size))]
+    ans[rank_cells(layer[0], size)] = 0
+    distance = 0
+    while layer:
+        distance += 1
+        next_layer = []
+        for state in layer:
+            zero = state.index(0)
+            for dummy_direction, target in neighbors[zero]:
+                child = list(state)
+                child[zero], child[target] = child[target], 0
+                rank = rank_cells(child, size)
+                if ans[rank] == 255:
+                    ans[rank] = distance
+                    next_layer.append(child)
+        layer = next_layer
+    _DISTANCES[shape] = ans
+    return ans
+
+def rank_cells(cells, size):
+    """
+    Rank a sequence of distinct cells drawn from range(size) among all
+    such sequences of the same length (partial Lehmer code)
+    Returns an integer in range(size! / (size - len(cells))!)
+    """
+    ans = 0
+    for idx, cell in enumerate(cells):
+        smaller = 0
+        for jdx in range(idx):
+            if cells[jdx] < cell:
+                smaller += 1
+        ans = ans * (size - idx) + cell - smaller
+    return ans
+
+def unrank_cells(rank, count, size):
+    """
+    Inverse of rank_cells for sequences of the given length
+    Returns a list of cells
+    """
+    digits = []
+    for idx in range(count - 1, -1, -1):
+        rank, digit = divmod(rank, size - idx)
+        digits.append(digit)
+    digits.reverse()
+    free = list(range(size))
+    return [free.pop(digit) for digit in digits]
+
+class MoveLog:
+    """
+    Appendable record of blank moves kept as a list of chunks, so a
+    long solution is joined once instead of copied on every append
+    """
+
+    def __init__(self, moves=""):
+        """
+        Start a log, optionally holding an initial move string
+        """
+        self._chunks = []
+        self._length = 0
+        self.append(moves)
+
+    def __str__(self):
+        """
+        Join the logged moves
+        Returns a string
+        """
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        if self._chunks:
+            return self._chunks[0]
+        return ""
+
+    def __len__(self):
+        """
+        Number of logged moves
+        Returns an integer
+        """
+        return self._length
+
+    def __iter__(self):
+        """
+        Generator that yields the logged moves one at a time
+        """
+        for chunk in self._chunks:
+            for direction in chunk:
+                yield direction
+
+    def append(self, moves):
+        """
+        Add a move string to the end of the log
+        """
+        if moves:
+            self._chunks.append(moves)
+            self._length += len(moves)
 
 class Puzzle:
     """
@@ -18,14 +308,19 @@ class Puzzle:
         """
         self._height = puzzle_height
         self._width = puzzle_width
-        self._grid = [[col + puzzle_width * row
-                       for col in range(self._width)]
-                      for row in range(self._height)]
+        # row-major tile values, plus the cell holding each value
+        size = puzzle_height * puzzle_width
+        if size <= 256:
+            typecode = "B"
+        else:
+            typecode = "H"
+        self._cells = array(typecode, range(size))
+        self._where = array(typecode, range(size))
 
         if initial_grid != None:
             for row in range(puzzle_height):
                 for col in range(puzzle_width):
-                    self._grid[row][col] = initial_grid[row][col]
+                    self.set_number(row, col, initial_grid[row][col])
 
     def __str__(self):
         """
@@ -34,7 +329,7 @@ class Puzzle:
         """
         ans = ""
         for row in range(self._height):
-            ans += str(self._grid[row])
+            ans += str(list(self._cells[row * self._width:(row + 1) * self._width]))
             ans += "\n"
         return ans
     
@@ -60,20 +355,24 @@ class Puzzle:
         Getter for the number at tile position pos
         Returns an integer
         """
-        return self._grid[row][col]
+        return self._cells[row * self._width + col]
 
     def set_number(self, row, col, value):
         """
         Setter for the number at tile position pos
         """
-        self._grid[row][col] = value
+        cell = row * self._width + col
+        self._cells[cell] = value
+        self._where[value] = cell
 
     def clone(self):
         """
         Make a copy of the puzzle to update during solving
         Returns a Puzzle object
         """
-        new_puzzle = Puzzle(self._height, self._width, self._grid)
+        new_puzzle = Puzzle(self._height, self._width)
+        new_puzzle._cells = array(self._cells.typecode, self._cells)
+        new_puzzle._where = array(self._where.typecode, self._where)
         return new_puzzle
 
     ########################################################
@@ -87,40 +386,65 @@ class Puzzle:
         """
         solved_value = (solved_col + self._width * solved_row)
 
-        for row in range(self._height):
-            for col in range(self._width):
-                if self._grid[row][col] == solved_value:
-                    return (row, col)
-        assert False, "Value " + str(solved_value) + " not found"
+        assert solved_value < len(self._where), "Value " + str(solved_value) + " not found"
+        cell = self._where[solved_value]
+        assert self._cells[cell] == solved_value, "Value " + str(solved_value) + " not found"
+        return divmod(cell, self._width)
 
     def update_puzzle(self, move_string):
         """
         Updates the puzzle state based on the provided move string
         """
-        zero_row, zero_col = self.current_position(0, 0)
+        width = self._width
+        cells = self._cells
+        where = self._where
+        zero = where[0]
         for direction in move_string:
             if direction == "l":
-                assert zero_col > 0, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row][zero_col - 1]
-                self._grid[zero_row][zero_col - 1] = 0
-                zero_col -= 1
+                assert zero % width > 0, "move off grid: " + direction
+                target = zero - 1
             elif direction == "r":
-                assert zero_col < self._width - 1, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row][zero_col + 1]
-                self._grid[zero_row][zero_col + 1] = 0
-                zero_col += 1
+                assert zero % width < width - 1, "move off grid: " + direction
+                target = zero + 1
             elif direction == "u":
-                assert zero_row > 0, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row - 1][zero_col]
-                self._grid[zero_row - 1][zero_col] = 0
-                zero_row -= 1
+                assert zero >= width, "move off grid: " + direction
+                target = zero - width
             elif direction == "d":
-                assert zero_row < self._height - 1, "move off grid: " + direction
-                self._grid[zero_row][zero_col] = self._grid[zero_row + 1][zero_col]
-                self._grid[zero_row + 1][zero_col] = 0
-                zero_row += 1
+                assert zero < len(cells) - width, "move off grid: " + direction
+                target = zero + width
             else:
                 assert False, "invalid direction: " + direction
+            tile = cells[target]
+            cells[zero] = tile
+            where[tile] = zero
+            cells[target] = 0
+            where[0] = target
+            zero = target
+
+    def is_solvable(self):
+        """
+        Check whether the puzzle holds each value once and can reach the
+        solved configuration: every move swaps the blank with a tile,
+        flipping both the permutation parity and the parity of the blank's
+        distance from the upper left corner, so the two must agree
+        Returns a boolean
+        """
+        size = self._height * self._width
+        if sorted(self._cells) != list(range(size)):
+            return False
+        if self._height == 1 or self._width == 1:
+            # tiles can only slide past the blank, never past each other
+            tiles = [value for value in self._cells if value != 0]
+            return tiles == sorted(tiles)
+        zero_row, zero_col = self.current_position(0, 0)
+        return count_inversions(self._cells) % 2 == (zero_row + zero_col) % 2
+
+    def is_solved(self):
+        """
+        Check whether every tile is in its solved position
+        Returns a boolean
+        """
+        return list(self._cells) == list(range(len(self._cells)))
 
     ##################################################################
     # Phase one methods
@@ -130,7 +454,8 @@ class Puzzle:
         """
         self.update_puzzle(string)
         #print self
-        return ans + string
+        ans.append(string)
+        return ans
         
     def __helper1__(self, top, low, string, ans):
         """
@@ -186,7 +511,7 @@ class Puzzle:
         Place correct tile at target position
         Updates puzzle and returns a move string. Assume i > 1, j > 0
         """
-        ans = ""
+        ans = MoveLog()
         temp = self.current_position(tar_row, tar_col)
         tar_tile = self.get_number(temp[0], temp[1])
                
@@ -194,7 +519,7 @@ class Puzzle:
         if tar_row == temp[0]:
             ans = self.__helper1__(tar_col, temp[1], 'l', ans)
             ans = self.__helper2__('urrdl', ans, tar_row, tar_col, tar_tile)
-            return ans
+            return str(ans)
         else: 
             # in this step the zero tile is elevated until row containing tar_tile
             ans = self.__helper1__(tar_row, temp[0], 'u', ans)
@@ -223,7 +548,7 @@ class Puzzle:
             ans = self.__helper2__('lddru', ans, tar_row, tar_col, tar_tile)
                
         ans = self.__helper0__('ld', ans)
-        return ans
+        return str(ans)
                 
     def solve_col0_tile(self, tar_row):
         """
@@ -231,13 +556,13 @@ class Puzzle:
         Updates puzzle and returns a move string
         """
         #print "-----------------INITIAL STATE-------------------- \n", self
-        ans = self.__helper0__('ur', "")
+        ans = self.__helper0__('ur', MoveLog())
         temp = self.current_position(tar_row, 0) # current position of tar_tile
         tar_tile = self.get_number(temp[0], temp[1])
         
         if temp[0] == tar_row and temp[1] == 0: # check if tar_tile is in place
             ans = self.__helper1__(self.get_width() - 2, 0, 'r', ans) # move it to rigthmost cell
-            return ans
+            return str(ans)
         
         if self.get_width() > 2:
             # if puzzle has width greater than 2, we will reduce it to the case 3x2
@@ -266,7 +591,7 @@ class Puzzle:
         ans = self.__helper0__('dlurdluurddlu', ans)
         ans = self.__helper1__(self.get_width() - 1, 0, 'r', ans) # move it to rigthmost cell
         
-        return ans
+        return str(ans)
 
     #############################################################
     # Phase two methods
@@ -306,15 +631,15 @@ class Puzzle:
         Solve the tile in row zero at the specified column
         Updates puzzle and returns a move string
         """
-        ans = ""
+        ans = MoveLog()
         #print "Initial state: \n", self
         if not self.row0_invariant(target_col):
             #print "does not meet row0_invariant!"
-            return ans
+            return str(ans)
         ans = self.__helper0__('l', ans)
         if self.get_number(0, target_col) == target_col:
             ans = self.__helper0__('d', ans)
-            return ans
+            return str(ans)
         elif self.get_number(0, target_col - 2) != target_col:
             while self.get_number(0, target_col - 2) != target_col:
                 ans = self.__helper1__(target_col, 1, 'l', ans)
@@ -322,120 +647,864 @@ class Puzzle:
                 ans = self.__helper1__(target_col, 1, 'r', ans)
                 ans = self.__helper0__('u', ans)
         ans = self.__helper0__('rdluldrruld', ans)
-        return ans
+        return str(ans)
             
     def solve_row1_tile(self, target_col):
         """
         Solve the tile in row one at the specified column
         Updates puzzle and returns a move string
         """
-        ans = ""
+        ans = MoveLog()
         #print "Initial state: \n", self
         if not self.row1_invariant(target_col):
             #print "does not meet row1_invariant!"
-            return ans
+            return str(ans)
         
         while not self.row0_invariant(target_col):
             ans = self.__helper1__(target_col, 0, 'l', ans)
             ans = self.__helper0__('u', ans)
             ans = self.__helper1__(target_col, 0, 'r', ans)
             if self.row0_invariant(target_col):
-                return ans
+                return str(ans)
             else:
                 ans = self.__helper0__('d', ans)
-        return ans
+        return str(ans)
             
 
     ###########################################################
     # Phase 3 methods
     
-    def __helper4__(self):
-        """
-        checks that the 2x2 is solved
-        """
-        if self.get_number(0, 0) != 0:
-            return False
-        if self.get_number(0, 1) != 1:
-            return False
-        if self.get_number(1, 0) != self.get_width():
-            return False
-        if self.get_number(1, 1) != self.get_width() + 1:
-            return False
-        return True        
-    
-    def __helper5__(self, ans):
-        """
-        retrieves the position of zero tile in the 2x2 puzzle
-        """
-        pos = self.current_position(0, 0)
-        if pos[0] == 0 and pos[1] == 0:
-            return ans
-        if pos[0] == 0 and pos[1] == 1:
-            self.update_puzzle('l')
-            return ans + 'l'
-        if pos[0] == 1 and pos[1] == 0:
-            self.update_puzzle('u')
-            return ans + 'u'
-        if pos[0] == 1 and pos[1] == 1:
-            self.update_puzzle('ul')
-            return ans + 'ul'
-        
     def solve_2x2(self):
         """
-        Solve the upper left 2x2 part of the puzzle
+        Solve the upper left 2x2 part of the puzzle in the fewest moves,
+        using the exact distance table of the 2x2 board
         Updates the puzzle and returns a move string
         """
         #print "INITIAL STATE\n", self
-        ans = self.__helper5__("")
-        while not self.__helper4__():
-            ans = self.__helper0__('d', ans)
-            if self.__helper4__():
-                return ans
-            ans = self.__helper0__('r', ans)
-            if self.__helper4__():
-                return ans
-            ans = self.__helper0__('u', ans)
-            if self.__helper4__():
-                return ans
-            ans = self.__helper0__('l', ans)
-            if self.__helper4__():
-                return ans
+        width = self.get_width()
+        local = {0: 0, 1: 1, width: 2, width + 1: 3}
+        grid = [[local.get(self.get_number(row, col), 4) for col in range(2)]
+                for row in range(2)]
+        assert max(grid[0] + grid[1]) < 4, "2x2 holds tiles from outside it"
+        ans = Puzzle(2, 2, grid).solve_exact(True)
+        self.update_puzzle(ans)
         return ans
     
-    def solve_puzzle(self):
+    def iter_solve_puzzle(self):
         """
-        Generate a solution string for a puzzle
-        Updates the puzzle and returns a move string
+        Generator version of solve_puzzle that yields the moves for
+        each tile as soon as that tile is placed
+        Updates the puzzle and yields move strings
         """
-        ans = ""
+        if not self.is_solvable():
+            raise ValueError("unsolvable puzzle:\n" + str(self))
         height = self.get_height()
         width = self.get_width()
         #print "Initial State: \n", self
         pos = self.current_position(0, 0)
-        ans = self.__helper1__(width, pos[1] + 1, 'r', ans)
+        ans = self.__helper1__(width, pos[1] + 1, 'r', MoveLog())
         ans = self.__helper1__(height, pos[0] + 1, 'd', ans)
+        yield str(ans)
         pos = self.current_position(0, 0)
         #print "Got to the corner!"
         while pos[0] > 1:
             if pos[1] == 0:
                 #print "solve_col0_tile"
-                ans += self.solve_col0_tile(pos[0])
+                yield self.solve_col0_tile(pos[0])
             else:
                 #print "solve_interior_tile"
-                ans += self.solve_interior_tile(pos[0], pos[1])
+                yield self.solve_interior_tile(pos[0], pos[1])
             pos = self.current_position(0, 0)
         while pos[1] > 1:
             if pos[0] == 0:
-                ans += self.solve_row0_tile(pos[1])
+                yield self.solve_row0_tile(pos[1])
             else:
-                ans += self.solve_row1_tile(pos[1])
+                yield self.solve_row1_tile(pos[1])
             pos = self.current_position(0, 0)
-        ans += self.solve_2x2()
-        
+        yield self.solve_2x2()
+
+    def solve_puzzle(self):
+        """
+        Generate a solution string for a puzzle
+        Updates the puzzle and returns a move string
+        """
+        ans = MoveLog()
+        for moves in self.iter_solve_puzzle():
+            ans.append(moves)
+        return str(ans)
+
+    ###########################################################
+    # Optimal solver methods
+
+    def manhattan_distance(self):
+        """
+        Sum of the distances of every tile (blank excluded) from its
+        solved position
+        Returns an integer
+        """
+        width = self.get_width()
+        ans = 0
+        for row in range(self.get_height()):
+            for col in range(width):
+                value = self.get_number(row, col)
+                if value != 0:
+                    ans += abs(value // width - row) + abs(value % width - col)
+        return ans
+
+    def linear_conflict(self):
+        """
+        Extra moves forced by pairs of tiles sitting in their goal row
+        (or column) in reversed order, two per tile that must step aside
+        Returns an integer
+        """
+        height = self.get_height()
+        width = self.get_width()
+        ans = 0
+        for row in range(height):
+            values = [self.get_number(row, col) for col in range(width)]
+            ans += line_conflicts([value % width for value in values
+                                   if value != 0 and value // width == row])
+        for col in range(width):
+            values = [self.get_number(row, col) for row in range(height)]
+            ans += line_conflicts([value // width for value in values
+                                   if value != 0 and value % width == col])
+        return 2 * ans
+
+    def solve_optimal(self, pdb=None):
+        """
+        Generate a shortest solution string for a puzzle using IDA*
+        guided by Manhattan distance plus linear conflict, or by an
+        additive PatternDatabase for this board size when it is larger
+        Updates the puzzle and returns a move string
+        """
+        if not self.is_solvable():
+            raise ValueError("unsolvable puzzle:\n" + str(self))
+        height = self.get_height()
+        width = self.get_width()
+        cells = list(self._cells)
+        where = list(self._where)
+        groups = []
+        if pdb is not None:
+            assert pdb.get_shape() == (height, width), "pattern database size mismatch"
+            groups = pdb.get_groups()
+        group_of = [None] * (height * width)
+        for group, tiles in enumerate(groups):
+            for tile in tiles:
+                group_of[tile] = group
+        scores = [pdb.lookup_group(group, where) for group in range(len(groups))]
+        neighbors = neighbor_cells(height, width)
+
+        def row_conflicts(row):
+            """
+            Conflicting tiles in the given row of the search state
+            """
+            values = cells[row * width:(row + 1) * width]
+            return line_conflicts([value % width for value in values
+                                   if value != 0 and value // width == row])
+
+        def col_conflicts(col):
+            """
+            Conflicting tiles in the given column of the search state
+            """
+            values = cells[col::width]
+            return line_conflicts([value // width for value in values
+                                   if value != 0 and value % width == col])
+
+        rows = [row_conflicts(row) for row in range(height)]
+        cols = [col_conflicts(col) for col in range(width)]
+        path = []
+
+        def search(blank, cost, bound, estimate, extra, last):
+            """
+            Depth first search below the given f-cost bound, with the
+            Manhattan plus linear conflict estimate and the pattern
+            database estimate tracked separately
+            Returns True when solved, otherwise the smallest f-cost
+            that exceeded the bound
+            """
+            if cost + max(estimate, extra) > bound:
+                return cost + max(estimate, extra)
+            if estimate == 0:
+                return True
+            ans = float("inf")
+            blank_row, blank_col = divmod(blank, width)
+            for direction, target in neighbors[blank]:
+                if direction == INVERSE.get(last):
+                    continue
+                tile = cells[target]
+                goal_row, goal_col = divmod(tile, width)
+                tar_row, tar_col = divmod(target, width)
+                delta = (abs(goal_row - blank_row) + abs(goal_col - blank_col)
+                         - abs(goal_row - tar_row) - abs(goal_col - tar_col))
+                cells[blank] = tile
+                cells[target] = 0
+                # only the lines the tile leaves or enters can change
+                if tar_row == blank_row:
+                    lines, old, changed = cols, (tar_col, blank_col), goal_col
+                    recount = col_conflicts
+                else:
+                    lines, old, changed = rows, (tar_row, blank_row), goal_row
+                    recount = row_conflicts
+                saved = None
+                if changed in old:
+                    saved = lines[changed]
+                    lines[changed] = recount(changed)
+                    delta += 2 * (lines[changed] - saved)
+                group = group_of[tile]
+                if group is not None:
+                    where[tile] = blank
+                    old_score = scores[group]
+                    scores[group] = pdb.lookup_group(group, where)
+                    extra += scores[group] - old_score
+                path.append(direction)
+                result = search(target, cost + 1, bound, estimate + delta, extra, direction)
+                if result is True:
+                    return True
+                path.pop()
+                if group is not None:
+                    where[tile] = target
+                    extra -= scores[group] - old_score
+                    scores[group] = old_score
+                if saved is not None:
+                    lines[changed] = saved
+                cells[target] = tile
+                cells[blank] = 0
+                ans = min(ans, result)
+            return ans
+
+        blank = cells.index(0)
+        estimate = self.manhattan_distance() + self.linear_conflict()
+        extra = sum(scores)
+        bound = max(estimate, extra)
+        while True:
+            result = search(blank, 0, bound, estimate, extra, None)
+            if result is True:
+                break
+            bound = result
+        ans = "".join(path)
+        self.update_puzzle(ans)
+        return ans
+
+    ###########################################################
+    # Exact small board methods
+
+    def solve_exact(self, use_table=False, max_states=2000000):
+        """
+        Generate a shortest solution string for a small puzzle, either by
+        walking down the precomputed distance_table (use_table) or by a
+        bidirectional BFS from the board and from the solved board that
+        stores at most max_states Lehmer-ranked states, raising
+        MemoryError when the search needs more
+        Updates the puzzle and returns a move string
+        """
+        if not self.is_solvable():
+            raise ValueError("unsolvable puzzle:\n" + str(self))
+        height = self.get_height()
+        width = self.get_width()
+        size = height * width
+        neighbors = neighbor_cells(height, width)
+        cells = list(self._cells)
+        if use_table:
+            table = distance_table(height, width)
+            ans = []
+            distance = table[rank_cells(cells, size)]
+            zero = cells.index(0)
+            while distance > 0:
+                for direction, target in neighbors[zero]:
+                    cells[zero], cells[target] = cells[target], 0
+                    if table[rank_cells(cells, size)] < distance:
+                        break
+                    cells[target], cells[zero] = cells[zero], 0
+                ans.append(direction)
+                zero = target
+                distance -= 1
+            ans = "".join(ans)
+            self.update_puzzle(ans)
+            return ans
+
+        # rank -> (parent rank, move from the parent) on each side
+        start = rank_cells(cells, size)
+        goal = rank_cells(list(range(size)), size)
+        sides = [({start: None}, [cells]), ({goal: None}, [list(range(size))])]
+        meet = None
+        if start == goal:
+            meet = start
+        while meet is None:
+            if not (sides[0][1] or sides[1][1]):
+                raise ValueError("unsolvable puzzle")
+            if len(sides[0][0]) + len(sides[1][0]) > max_states:
+                raise MemoryError("more than " + str(max_states) + " states stored")
+            # grow the side with the smaller frontier by one layer
+            if len(sides[0][1]) <= len(sides[1][1]):
+                seen, frontier = sides[0]
+                other = sides[1][0]
+            else:
+                seen, frontier = sides[1]
+                other = sides[0][0]
+            layer = []
+            for state in frontier:
+                parent = rank_cells(state, size)
+                zero = state.index(0)
+                for direction, target in neighbors[zero]:
+                    child = list(state)
+                    child[zero], child[target] = child[target], 0
+                    rank = rank_cells(child, size)
+                    if rank not in seen:
+                        seen[rank] = (parent, direction)
+                        layer.append(child)
+                        if rank in other:
+                            meet = rank
+                            break
+                if meet is not None:
+                    break
+            frontier[:] = layer
+
+        ans = []
+        rank = meet
+        while sides[0][0][rank] is not None:
+            rank, direction = sides[0][0][rank]
+            ans.append(direction)
+        ans.reverse()
+        rank = meet
+        while sides[1][0][rank] is not None:
+            rank, direction = sides[1][0][rank]
+            ans.append(INVERSE[direction])
+        ans = "".join(ans)
+        self.update_puzzle(ans)
+        return ans
+
+    ###########################################################
+    # Solution post-processing
+
+    def optimize_solution(self, move_string, max_window=8):
+        """
+        Shorten a solution for the current puzzle with compress_moves and
+        check on a clone that the shorter string still solves it
+        Returns a tuple (move string, fraction of moves kept)
+        """
+        ans = compress_moves(move_string, max_window)
+        clone = self.clone()
+        clone.update_puzzle(ans)
+        assert clone.is_solved(), "compressed moves do not solve the puzzle"
+        if not move_string:
+            return ans, 1.0
+        return ans, float(len(ans)) / len(move_string)
+
+    def solve_compressed(self, max_window=8):
+        """
+        Generate a solution string with solve_puzzle and shorten it
+        with optimize_solution
+        Updates the puzzle and returns a move string
+        """
+        ans = self.optimize_solution(self.clone().solve_puzzle(), max_window)[0]
+        self.update_puzzle(ans)
         return ans
         
-# Start interactive simulation
-# poc_fifteen_gui.FifteenGUI(Puzzle(5, 5))
+##################################################################
+# Additive pattern databases
+
+PDB_MAGIC = b"PDB1"
+PDB_HEADER = "<4sHHH"
+
+def default_partition(puzzle_height, puzzle_width, group_size=5):
+    """
+    Split the tiles (blank excluded) into disjoint groups of consecutive
+    values, each holding at most group_size tiles
+    Returns a list of tuples
+    """
+    tiles = list(range(1, puzzle_height * puzzle_width))
+    return [tuple(tiles[idx:idx + group_size])
+            for idx in range(0, len(tiles), group_size)]
+
+def build_pattern_table(puzzle_height, puzzle_width, tiles):
+    """
+    Retrograde 0-1 BFS from the solved board over blank moves, where
+    only moves that shift a pattern tile are counted
+    Returns a bytearray indexed by rank_cells of the pattern tile cells
+    holding the fewest pattern tile moves needed to solve them
+    """
+    size = puzzle_height * puzzle_width
+    count = len(tiles)
+    entries = 1
+    for idx in range(count):
+        entries *= size - idx
+    assert entries * size < 2 ** 32, "pattern too large: " + str(tiles)
+    neighbors = [[target for dummy_direction, target in moves]
+                 for moves in neighbor_cells(puzzle_height, puzzle_width)]
+
+    # distances of (pattern cells, blank cell) states, 255 when unseen
+    dist = bytearray(b"\xff") * (entries * size)
+    start = rank_cells(list(tiles), size) * size
+    dist[start] = 0
+    queue = collections.deque([start])
+    while queue:
+        state = queue.popleft()
+        rank, blank = divmod(state, size)
+        depth = dist[state]
+        cells = None
+        for target in neighbors[blank]:
+            if cells is None:
+                cells = unrank_cells(rank, count, size)
+            if target in cells:
+                moved = list(cells)
+                moved[cells.index(target)] = blank
+                new_state = rank_cells(moved, size) * size + target
+                if depth + 1 < dist[new_state]:
+                    dist[new_state] = depth + 1
+                    queue.append(new_state)
+            else:
+                new_state = rank * size + target
+                if depth < dist[new_state]:
+                    dist[new_state] = depth
+                    queue.appendleft(new_state)
+
+    table = bytearray(entries)
+    for rank in range(entries):
+        table[rank] = min(dist[rank * size:(rank + 1) * size])
+    return table
+
+class PatternDatabase:
+    """
+    Additive disjoint pattern databases for one board size, built on
+    first use and cached as memory-mapped files in cache_dir
+    """
+
+    def __init__(self, puzzle_height, puzzle_width, partition=None, cache_dir="pdb_cache"):
+        """
+        Load (or build and save) one table per tile group
+        """
+        self._height = puzzle_height
+        self._width = puzzle_width
+        if partition is None:
+            partition = default_partition(puzzle_height, puzzle_width)
+        self._groups = [tuple(tiles) for tiles in partition]
+        used = sorted(tile for tiles in self._groups for tile in tiles)
+        assert len(used) == len(set(used)), "pattern groups overlap"
+        assert 0 not in used, "blank cannot be a pattern tile"
+        self._cache_dir = cache_dir
+        self._files = []
+        self._tables = []
+        self._stats = []
+        for tiles in self._groups:
+            self._load_group(tiles)
+
+    def __str__(self):
+        """
+        Generate a report of build time and size for every table
+        Returns a string
+        """
+        ans = ""
+        for tiles, stats in zip(self._groups, self._stats):
+            ans += str(list(tiles)) + ": " + str(stats["entries"]) + " entries, "
+            if stats["cached"]:
+                ans += "loaded from cache\n"
+            else:
+                ans += "built in " + str(round(stats["build_time"], 3)) + "s\n"
+        return ans
+
+    def _path(self, tiles):
+        """
+        Cache file used for the given tile group
+        Returns a string
+        """
+        name = "pdb_" + str(self._height) + "x" + str(self._width) + "_"
+        name += "-".join(str(tile) for tile in tiles) + ".bin"
+        return os.path.join(self._cache_dir, name)
+
+    def _load_group(self, tiles):
+        """
+        Memory-map the table for a tile group, building it first if no
+        cache file exists
+        """
+        path = self._path(tiles)
+        header = struct.pack(PDB_HEADER, PDB_MAGIC, self._height, self._width, len(tiles))
+        header += struct.pack("<" + "H" * len(tiles), *tiles)
+        stats = {"tiles": tiles, "cached": os.path.exists(path), "build_time": 0.0}
+        if not stats["cached"]:
+            start = time.time()
+            table = build_pattern_table(self._height, self._width, tiles)
+            stats["build_time"] = time.time() - start
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir)
+            # write under a temporary name so readers never see a partial file
+            temp_path = path + "." + str(os.getpid()) + ".tmp"
+            with open(temp_path, "wb") as out:
+                out.write(header)
+                out.write(table)
+            os.rename(temp_path, path)
+        with open(path, "rb") as source:
+            table = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        assert table[:len(header)] == header, "corrupt pattern database: " + path
+        stats["entries"] = len(table) - len(header)
+        self._files.append(path)
+        self._tables.append(memoryview(table)[len(header):])
+        self._stats.append(stats)
+
+    def get_shape(self):
+        """
+        Getter for the board size the tables were built for
+        Returns a tuple of two integers
+        """
+        return (self._height, self._width)
+
+    def get_groups(self):
+        """
+        Getter for the tile groups
+        Returns a list of tuples
+        """
+        return list(self._groups)
+
+    def get_stats(self):
+        """
+        Build time, entry count and cache status of every table
+        Returns a list of dictionaries
+        """
+        return [dict(stats) for stats in self._stats]
+
+    def lookup_group(self, group, where):
+        """
+        Moves needed by the tiles of one group, where where[value] is
+        the cell currently holding that tile
+        Returns an integer
+        """
+        size = self._height * self._width
+        cells = [where[tile] for tile in self._groups[group]]
+        return self._tables[group][rank_cells(cells, size)]
+
+    def lookup(self, puzzle):
+        """
+        Additive heuristic estimate for a Puzzle of matching size
+        Returns an integer
+        """
+        where = [0] * (self._height * self._width)
+        for row in range(self._height):
+            for col in range(self._width):
+                where[puzzle.get_number(row, col)] = row * self._width + col
+        return sum(self.lookup_group(group, where) for group in range(len(self._groups)))
+
+    def measure_lookups(self, samples=100000, seed=None):
+        """
+        Time group lookups on random tile placements
+        Returns lookups per second
+        """
+        size = self._height * self._width
+        rng = random.Random(seed)
+        placements = []
+        for dummy_idx in range(min(samples, 1000)):
+            where = list(range(size))
+            rng.shuffle(where)
+            placements.append(where)
+        start = time.time()
+        for idx in range(samples):
+            where = placements[idx % len(placements)]
+            for group in range(len(self._groups)):
+                self.lookup_group(group, where)
+        elapsed = max(time.time() - start, 1e-9)
+        return samples * len(self._groups) / elapsed
+
+##################################################################
+# Batch solving
+
+def read_boards(path):
+    """
+    Generator that yields (board id, grid) pairs from a file with one
+    board per line, either a JSON grid such as [[3, 1], [2, 0]] or a
+    JSON object with "grid" and optional "id" keys (JSONL)
+    Boards without an id are numbered by line
+    """
+    with open(path) as source:
+        for line_number, line in enumerate(source):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict):
+                yield (record.get("id", line_number), record["grid"])
+            else:
+                yield (line_number, record)
+
+def check_grid(grid):
+    """
+    Check that grid is a non-empty list of equal length rows holding
+    each of the values 0 to height*width - 1 exactly once
+    Raises ValueError describing the first problem found
+    """
+    if not isinstance(grid, list) or not grid:
+        raise ValueError("grid must be a non-empty list of rows")
+    width = None
+    values = []
+    for row in grid:
+        if not isinstance(row, list) or not row:
+            raise ValueError("grid rows must be non-empty lists")
+        if width is None:
+            width = len(row)
+        elif len(row) != width:
+            raise ValueError("grid rows must all have the same length")
+        for value in row:
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError("grid values must be integers: " + repr(value))
+            values.append(value)
+    if sorted(values) != list(range(len(values))):
+        raise ValueError("grid must hold each value from 0 to " +
+                         str(len(values) - 1) + " exactly once")
+
+def screen_board(grid):
+    """
+    Return grid if it is well formed and solvable, otherwise None
+    """
+    try:
+        check_grid(grid)
+    except ValueError:
+        return None
+    if not Puzzle(len(grid), len(grid[0]), grid).is_solvable():
+        return None
+    return grid
+
+def solve_board(job):
+    """
+    Solve one (board id, grid, method) job, where method names the
+    Puzzle solver to run
+    Returns a tuple (board id, move string, move count, seconds), with
+    None for the moves and count when the grid is malformed or the
+    solver fails on the board, which is how unsolvable boards are
+    rejected up front
+    """
+    board_id, grid, method = job
+    start = time.time()
+    if grid is None:
+        # screened out by solve_batch
+        return (board_id, None, None, 0.0)
+    try:
+        check_grid(grid)
+        puzzle = Puzzle(len(grid), len(grid[0]), grid)
+        moves = getattr(puzzle, method)()
+    except (AssertionError, ValueError, MemoryError):
+        return (board_id, None, None, time.time() - start)
+    return (board_id, moves, len(moves), time.time() - start)
+
+def solve_batch(boards, processes=None, ordered=True, method="solve_puzzle", chunksize=1):
+    """
+    Generator that solves (board id, grid) pairs over a pool of worker
+    processes, one per core by default, and yields solve_board results
+    in input order, or as they complete when ordered is False
+    Malformed and unsolvable boards are screened out here and reach the
+    workers without their grid, so no worker time is spent on them
+    """
+    import multiprocessing
+    jobs = ((board_id, screen_board(grid), method) for board_id, grid in boards)
+    pool = multiprocessing.Pool(processes)
+    try:
+        if ordered:
+            results = pool.imap(solve_board, jobs, chunksize)
+        else:
+            results = pool.imap_unordered(solve_board, jobs, chunksize)
+        for result in results:
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def write_results(results, out):
+    """
+    Write solve_board results to an open file as JSONL records
+    Returns the number of records written
+    """
+    count = 0
+    for board_id, moves, move_count, seconds in results:
+        record = {"id": board_id, "moves": moves, "count": move_count, "seconds": seconds}
+        out.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+##################################################################
+# Benchmarks
+
+BENCHMARK_SIZES = [(3, 3), (4, 4), (5, 5), (10, 10), (20, 20), (30, 30)]
+BENCHMARK_FIELDS = ["height", "width", "depth", "method", "trials", "solved",
+                    "failed", "seconds_mean", "seconds_max", "moves_min",
+                    "moves_median", "moves_mean", "moves_max", "peak_kib"]
+
+def random_board(puzzle_height, puzzle_width, rng, depth=None):
+    """
+    Generate a solvable board, uniformly at random when depth is None
+    and otherwise by a random walk of depth blank moves that never
+    undoes the previous move
+    Returns a grid as a list of lists
+    """
+    puzzle = Puzzle(puzzle_height, puzzle_width)
+    size = puzzle_height * puzzle_width
+    if depth is None:
+        cells = list(range(size))
+        rng.shuffle(cells)
+        grid = [cells[row * puzzle_width:(row + 1) * puzzle_width]
+                for row in range(puzzle_height)]
+        puzzle = Puzzle(puzzle_height, puzzle_width, grid)
+        if not puzzle.is_solvable():
+            # swapping two tiles flips the permutation parity
+            first, second = [cell for cell in range(size) if cells[cell] != 0][:2]
+            cells[first], cells[second] = cells[second], cells[first]
+    else:
+        last = None
+        for dummy_idx in range(depth):
+            zero_row, zero_col = puzzle.current_position(0, 0)
+            choices = [direction for direction, offset in sorted(MOVES.items())
+                       if 0 <= zero_row + offset[0] < puzzle_height
+                       and 0 <= zero_col + offset[1] < puzzle_width
+                       and direction != INVERSE.get(last)]
+            last = rng.choice(choices)
+            puzzle.update_puzzle(last)
+        cells = [puzzle.get_number(row, col)
+                 for row in range(puzzle_height) for col in range(puzzle_width)]
+    return [cells[row * puzzle_width:(row + 1) * puzzle_width]
+            for row in range(puzzle_height)]
+
+def run_benchmark(sizes=None, depths=(None,), trials=10, seed=0,
+                  methods=("solve_puzzle", "solve_compressed")):
+    """
+    Time each solver method on the same seeded boards for every size
+    and scramble depth (None meaning a uniformly random board), and
+    trace peak memory over one extra solve per configuration
+    Boards a method fails on count as failed and are left out of the
+    time and move statistics
+    Returns a list of dictionaries keyed by BENCHMARK_FIELDS
+    """
+    import tracemalloc
+    if sizes is None:
+        sizes = BENCHMARK_SIZES
+    rng = random.Random(seed)
+    ans = []
+    for puzzle_height, puzzle_width in sizes:
+        for depth in depths:
+            boards = [random_board(puzzle_height, puzzle_width, rng, depth)
+                      for dummy_idx in range(trials)]
+            for method in methods:
+                # untimed warm up, so one-off table builds are not counted
+                solve_board((None, boards[0], method))
+                times = []
+                counts = []
+                for grid in boards:
+                    dummy_id, moves, count, seconds = solve_board((None, grid, method))
+                    if moves is not None:
+                        times.append(seconds)
+                        counts.append(count)
+                tracemalloc.start()
+                solve_board((None, boards[0], method))
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                counts.sort()
+                record = {"height": puzzle_height, "width": puzzle_width,
+                          "depth": depth, "method": method, "trials": trials,
+                          "solved": len(counts), "failed": trials - len(counts),
+                          "seconds_mean": None, "seconds_max": None,
+                          "moves_min": None, "moves_median": None,
+                          "moves_mean": None, "moves_max": None,
+                          "peak_kib": peak / 1024.0}
+                if counts:
+                    record["seconds_mean"] = sum(times) / len(times)
+                    record["seconds_max"] = max(times)
+                    record["moves_min"] = counts[0]
+                    record["moves_median"] = counts[len(counts) // 2]
+                    record["moves_mean"] = float(sum(counts)) / len(counts)
+                    record["moves_max"] = counts[-1]
+                ans.append(record)
+    return ans
+
+def write_benchmark(records, path):
+    """
+    Save run_benchmark records as JSON, or as CSV when the path ends
+    in .csv
+    """
+    import csv
+    with open(path, "w") as out:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(out, BENCHMARK_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            json.dump(records, out, indent=1)
+
+##################################################################
+# Command line interface
+
+def run_gui(puzzle):
+    """
+    Start the interactive simulation for the given puzzle
+    """
+    import poc_fifteen_gui
+    poc_fifteen_gui.FifteenGUI(puzzle)
+
+def parse_size(text):
+    """
+    Parse a board size written as HEIGHTxWIDTH
+    Returns a tuple of two integers
+    """
+    height, width = text.lower().split("x")
+    return (int(height), int(width))
+
+def main(argv=None):
+    """
+    Command line entry point: solve one board, solve a batch file,
+    run the benchmarks or start the GUI
+    """
+    parser = argparse.ArgumentParser(description="Fifteen puzzle solver")
+    commands = parser.add_subparsers(dest="command")
+    solve = commands.add_parser("solve", help="solve one board given as a JSON grid")
+    solve.add_argument("grid", help="JSON grid such as [[3, 1], [2, 0]], or - for stdin")
+    solve.add_argument("--method", default="solve_puzzle")
+    batch = commands.add_parser("batch", help="solve a file of boards over a process pool")
+    batch.add_argument("boards", help="file with one JSON grid or JSONL record per line")
+    batch.add_argument("-o", "--output", help="JSONL results file (default stdout)")
+    batch.add_argument("--processes", type=int)
+    batch.add_argument("--unordered", action="store_true",
+                       help="write results as they complete")
+    batch.add_argument("--method", default="solve_puzzle")
+    bench = commands.add_parser("bench", help="run the solver benchmarks")
+    bench.add_argument("--sizes", nargs="+", type=parse_size)
+    bench.add_argument("--depths", nargs="+", type=int,
+                       help="random walk scramble depths (default uniform boards)")
+    bench.add_argument("--trials", type=int, default=10)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--methods", nargs="+", default=["solve_puzzle", "solve_compressed"])
+    bench.add_argument("-o", "--output", help=".json or .csv report (default JSON on stdout)")
+    gui = commands.add_parser("gui", help="start the interactive simulation")
+    gui.add_argument("size", nargs="?", type=parse_size, default=(4, 4))
+    args = parser.parse_args(argv)
+
+    if args.command == "solve":
+        if args.grid == "-":
+            grid = json.load(sys.stdin)
+        else:
+            grid = json.loads(args.grid)
+        dummy_id, moves, count, seconds = solve_board((None, grid, args.method))
+        if moves is None:
+            sys.exit("cannot solve board")
+        sys.stdout.write(moves + "\n")
+    elif args.command == "batch":
+        results = solve_batch(read_boards(args.boards), args.processes,
+                              not args.unordered, args.method)
+        if args.output:
+            with open(args.output, "w") as out:
+                write_results(results, out)
+        else:
+            write_results(results, sys.stdout)
+    elif args.command == "bench":
+        depths = args.depths
+        if depths is None:
+            depths = [None]
+        records = run_benchmark(args.sizes, depths, args.trials, args.seed, args.methods)
+        if args.output:
+            write_benchmark(records, args.output)
+        else:
+            json.dump(records, sys.stdout, indent=1)
+            sys.stdout.write("\n")
+    elif args.command == "gui":
+        run_gui(Puzzle(args.size[0], args.size[1]))
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
 
 # TESTS
 """
@@ -1,31 +1,107 @@
 """
 Cookie Clicker Simulator
+
+simpleplot is only imported to plot, so tournaments run headless.
 """
 
-import simpleplot
+import array
+import bisect
+import collections
+import json
 import math
 import random
+import time
 
-# Used to increase the timeout, if necessary
-import codeskulptor
-codeskulptor.set_timeout(20)
+# Used to increase the timeout, if necessary (CodeSkulptor only)
+try:
+    import codeskulptor
+    codeskulptor.set_timeout(20)
+except ImportError:
+    pass
 
 import poc_clicker_provided as provided
 
 # Constants
 SIM_TIME = 10000000000.0
 
+class HistoryView:
+    """
+    Read-only view of a ClickerState history, handed to strategies
+    instead of a copy.  It also keeps how many of each item were bought.
+    """
+
+    def __init__(self, state):
+        self._state = state
+
+    def __len__(self):
+        """
+        Return the number of history entries
+        """
+        return len(self._state._times)
+
+    def __getitem__(self, index):
+        """
+        Return one entry, or a list of the entries of a slice
+        """
+        if isinstance(index, slice):
+            return self._state._history_list()[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return self._state._history_entry(index)
+
+    def __iter__(self):
+        """
+        Iterate over the entries, oldest first
+        """
+        return iter(self._state._history_list())
+
+    def item_count(self, item_name):
+        """
+        Return how many times item_name was bought, counting
+        purchases dropped from a downsampled or bounded history
+        """
+        return self._state._item_counts.get(item_name, 0)
+
+    def get_counts(self):
+        """
+        Return a dictionary mapping each bought item to how many
+        times it was bought
+        """
+        return dict(self._state._item_counts)
+
 class ClickerState:
     """
     Simple class to keep track of the game state.
+
+    The history is stored in columns: times, costs and total cookies
+    as arrays of doubles, and items as small integer codes into a list
+    of item names, with code 0 standing for None.  With keep_every
+    greater than 1 only every keep_every-th purchase is recorded, and
+    with max_entries set only the latest max_entries entries are kept.
     """
     
-    def __init__(self):
+    def __init__(self, keep_every=1, max_entries=None):
         self._total_cookies = 0.0
         self._current_cookies = 0.0
         self._current_time = 0.0
         self._current_cps = 1.0
-        self._history_list = [(0.0, None, 0.0, 0.0)]
+        self._keep_every = keep_every
+        self._max_entries = max_entries
+        self._times = array.array('d')
+        self._items = array.array('H')
+        self._costs = array.array('d')
+        self._totals = array.array('d')
+        self._item_names = [None]
+        self._item_codes = {None: 0}
+        # records offered so far, and the slot of the oldest entry once
+        # a bounded history wraps around
+        self._recorded = 0
+        self._start = 0
+        self._item_counts = {}
+        self._history_view = HistoryView(self)
+        self._record(0.0, None, 0.0, 0.0)
         
     def __str__(self):
         """
@@ -55,6 +131,14 @@ class ClickerState:
         """
         return self._current_cps
     
+    def get_total_cookies(self):
+        """
+        Get total number of cookies produced so far
+
+        Should return a float
+        """
+        return self._total_cookies
+
     def get_time(self):
         """
         Get current time
@@ -75,7 +159,99 @@ class ClickerState:
         Should return a copy of any internal data structures,
         so that they will not be modified outside of the class.
         """
-        return list(self._history_list)
+        return self._history_list()
+
+    def get_history_view(self):
+        """
+        Return a read-only HistoryView of the history, without copying
+        it.  The view follows later purchases.
+        """
+        return self._history_view
+
+    def get_item_names(self):
+        """
+        Return the list of item names indexed by the item codes of
+        history_arrays, starting with None
+        """
+        return list(self._item_names)
+
+    def history_arrays(self):
+        """
+        Return the history as a dictionary of NumPy arrays, oldest
+        first: "time", "item" (codes into get_item_names), "cost" and
+        "total_cookies"
+        """
+        import numpy
+        columns = {"time": (self._times, numpy.float64),
+                   "item": (self._items, numpy.uint16),
+                   "cost": (self._costs, numpy.float64),
+                   "total_cookies": (self._totals, numpy.float64)}
+        ans = {}
+        for name, (column, dtype) in columns.items():
+            # copy, as an exported buffer would stop the array growing
+            values = numpy.frombuffer(column, dtype).copy()
+            ans[name] = numpy.roll(values, -self._start)
+        return ans
+
+    def write_history_csv(self, out):
+        """
+        Write the history to an open file as CSV rows of time, item,
+        cost and total cookies, with an empty item for None
+        """
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(["time", "item", "cost", "total_cookies"])
+        for entry_time, item_name, cost, total in self._history_view:
+            if item_name is None:
+                item_name = ""
+            writer.writerow([repr(entry_time), item_name, repr(cost), repr(total)])
+
+    def _record(self, entry_time, item_name, cost, total):
+        """
+        Add an entry to the history, subject to downsampling and to
+        the size bound
+        """
+        self._recorded += 1
+        if (self._recorded - 1) % self._keep_every:
+            return
+        code = self._item_codes.get(item_name)
+        if code is None:
+            code = len(self._item_names)
+            self._item_codes[item_name] = code
+            self._item_names.append(item_name)
+        if self._max_entries is not None and len(self._times) == self._max_entries:
+            slot = self._start
+            self._times[slot] = entry_time
+            self._items[slot] = code
+            self._costs[slot] = cost
+            self._totals[slot] = total
+            self._start = (slot + 1) % self._max_entries
+        else:
+            self._times.append(entry_time)
+            self._items.append(code)
+            self._costs.append(cost)
+            self._totals.append(total)
+
+    def _history_list(self):
+        """
+        Return the whole history as a list of tuples, oldest first,
+        built at C speed and rotated by slicing once a bounded history
+        has wrapped around
+        """
+        entries = list(zip(self._times,
+                           map(self._item_names.__getitem__, self._items),
+                           self._costs, self._totals))
+        if self._start:
+            entries = entries[self._start:] + entries[:self._start]
+        return entries
+
+    def _history_entry(self, index):
+        """
+        Return history entry index, oldest first, as a tuple
+        """
+        slot = (self._start + index) % len(self._times)
+        return (self._times[slot], self._item_names[self._items[slot]],
+                self._costs[slot], self._totals[slot])
 
     def time_until(self, cookies):
         """
@@ -112,22 +288,152 @@ class ClickerState:
         if cost <= self._current_cookies:
             self._current_cookies += -cost
             self._current_cps += additional_cps
-            self._history_list.append((self._current_time, item_name, cost, self._total_cookies))
+            self._record(self._current_time, item_name, cost, self._total_cookies)
+            self._item_counts[item_name] = self._item_counts.get(item_name, 0) + 1
         else:
             return
 
-def simulate_clicker(build_info, duration, strategy):
+class ItemCatalog:
+    """
+    BuildInfo wrapper that keeps its items sorted by cost and by
+    cps/cost ratio, and the set of items bought, all updated by
+    update_item, so strategies pick an item without scanning every
+    item.  Ties go to the item listed first by build_items, as in a
+    linear scan.
+    """
+
+    def __init__(self, build_info, history=()):
+        self._info = build_info
+        self._items = build_info.build_items()
+        self._index = dict((item, idx) for idx, item in enumerate(self._items))
+        # (cost, index, item) ascending, and (-ratio, index, item) ascending
+        self._by_cost = sorted(self._cost_key(item) for item in self._items)
+        self._by_ratio = sorted(self._ratio_key(item) for item in self._items)
+        self._purchased = set(record[1] for record in history if record[1] is not None)
+
+    def _cost_key(self, item):
+        """
+        Sort key of item in the cost index
+        """
+        return (self._info.get_cost(item), self._index[item], item)
+
+    def _ratio_key(self, item):
+        """
+        Sort key of item in the ratio index
+        """
+        return (-float(self._info.get_cps(item)) / self._info.get_cost(item),
+                self._index[item], item)
+
+    def build_items(self):
+        """
+        Return a list of the item names
+        """
+        return list(self._items)
+
+    def get_cost(self, item):
+        """
+        Return the current cost of item
+        """
+        return self._info.get_cost(item)
+
+    def get_cps(self, item):
+        """
+        Return the cps of item
+        """
+        return self._info.get_cps(item)
+
+    def update_item(self, item):
+        """
+        Grow the cost of item after buying it, and mark it bought
+        """
+        self._by_cost.pop(bisect.bisect_left(self._by_cost, self._cost_key(item)))
+        self._by_ratio.pop(bisect.bisect_left(self._by_ratio, self._ratio_key(item)))
+        self._info.update_item(item)
+        bisect.insort(self._by_cost, self._cost_key(item))
+        bisect.insort(self._by_ratio, self._ratio_key(item))
+        self._purchased.add(item)
+
+    def clone(self):
+        """
+        Return an independent copy of the catalog
+        """
+        catalog = ItemCatalog(self._info.clone())
+        catalog._purchased = set(self._purchased)
+        return catalog
+
+    def is_purchased(self, item):
+        """
+        Return True if item was bought
+        """
+        return item in self._purchased
+
+    def cheapest(self, budget, skip_purchased=False):
+        """
+        Return the cheapest item costing at most budget (never bought
+        before when skip_purchased is True), or None
+        """
+        for cost, dummy_idx, item in self._by_cost:
+            if cost > budget:
+                return None
+            if not (skip_purchased and item in self._purchased):
+                return item
+        return None
+
+    def most_expensive(self, budget):
+        """
+        Return the most expensive item costing at most budget, or None
+        """
+        end = bisect.bisect_right(self._by_cost, (budget, len(self._items)))
+        if end == 0:
+            return None
+        cost = self._by_cost[end - 1][0]
+        return self._by_cost[bisect.bisect_left(self._by_cost, (cost, -1))][2]
+
+    def best_ratio(self, budget):
+        """
+        Return the item with the highest cps/cost ratio costing at
+        most budget, or None
+        """
+        for dummy_ratio, dummy_idx, item in self._by_ratio:
+            if self._info.get_cost(item) <= budget:
+                return item
+        return None
+
+def item_catalog(build_info, history=()):
+    """
+    Return build_info itself if it is an ItemCatalog, otherwise a new
+    catalog over it whose bought items are read from history
+    """
+    if isinstance(build_info, ItemCatalog):
+        return build_info
+    return ItemCatalog(build_info, history)
+
+def simulate_clicker(build_info, duration, strategy, copy_history=False,
+                     keep_every=1, max_entries=None):
     """
     Function to run a Cookie Clicker game for the given
     duration with the given strategy.  Returns a ClickerState
     object corresponding to the final state of the game.
+
+    The strategy gets a read-only HistoryView of the history, so each
+    purchase costs constant time however long the history grows.
+    With copy_history True it gets a fresh get_history list on every
+    call instead, which rebuilds every entry from the history columns
+    and so is much slower on long games.  The game plays out the same
+    either way.  Strategies get the
+    build info wrapped in an ItemCatalog.  keep_every and max_entries
+    thin out the recorded history as described in ClickerState.
     """
-    info = build_info.clone()
-    clicker = ClickerState()
+    info = ItemCatalog(build_info.clone())
+    clicker = ClickerState(keep_every, max_entries)
+    if copy_history:
+        get_history = clicker.get_history
+    else:
+        get_history = clicker.get_history_view
     
     while clicker.get_time() <= duration:
         time_left = duration - clicker.get_time()
-        item = strategy(clicker.get_cookies(), clicker.get_cps(), clicker.get_history(), time_left, info)
+        item = strategy(clicker.get_cookies(), clicker.get_cps(), get_history(), time_left, info)
         if item == None:
             break
         time_until = clicker.time_until(info.get_cost(item))
@@ -176,122 +482,650 @@ def strategy_cheap(cookies, cps, history, time_left, build_info):
     """
     Always buy the cheapest item you can afford in the time left.
     """
-    info = build_info # info of upgrades
-    items = info.build_items()
     potential = cookies + cps * time_left # available resources to buy upgrades
-    temp = []
-    flag = False
-    for item in items: # filter those upgrades that are feasible
-        if info.get_cost(item) <= potential:
-            temp.append(item)
-    if len(temp) > 0:
-        flag = True
-        cheap_item = temp[0] # initialze item arbitrarily
-        for item in temp:
-            if info.get_cost(item) < info.get_cost(cheap_item): # criteria of selection
-                cheap_item = item
-    if flag:
-        return cheap_item
-    else:
-        return None
+    return item_catalog(build_info).cheapest(potential)
     
 def strategy_cheap_once(cookies, cps, history, time_left, build_info):
     """
     Always buy the cheapest item you can afford, from the "once cheapest" list
     """
-    info = build_info # info of upgrades
-    items = info.build_items()
     potential = cookies + cps * time_left # available resources to buy upgrades
-    temp = []
-    flag = False
-    for item in items: # filter those upgrades that are feasible
-        if info.get_cost(item) <= potential and not history_test(history, item):
-            temp.append(item)
-    if len(temp) > 0:
-        flag = True
-        cheap_item = temp[0] # initialze item arbitrarily
-        for item in temp:
-            if info.get_cost(item) < info.get_cost(cheap_item): # criteria of selection
-                cheap_item = item
-    if flag:
-        return cheap_item
-    else:
-        return None
+    return item_catalog(build_info, history).cheapest(potential, True)
 
 def strategy_expensive(cookies, cps, history, time_left, build_info):
     """
     Always buy the most expensive item you can afford in the time left.
     """
-    info = build_info # info of upgrades
-    items = info.build_items()
     potential = cookies + cps * time_left # available resources to buy upgrades
-    temp = []
-    flag = False
-    for item in items: # filter those upgrades that are feasible
-        if info.get_cost(item) <= potential:
-            temp.append(item)
-    if len(temp) > 0: # if feasible
-        flag = True
-        expensive_item = temp[0] # initialize item arbitrarily
-        for item in temp:
-            if info.get_cost(item) > info.get_cost(expensive_item): # criteria of selection
-                expensive_item = item
-    if flag:
-        return expensive_item
-    else:
-        return None
+    return item_catalog(build_info).most_expensive(potential)
 
 def strategy_best(cookies, cps, history, time_left, build_info):
     """
-    The best strategy that you are able to implement.
+    The best strategy that you are able to implement: buy the item
+    with the highest cps/cost ratio you can afford in the time left.
     """
-    info = build_info # info of upgrades
-    items = info.build_items()
     potential = cookies + cps * time_left # available resources to buy upgrades
-    temp = []
-    flag = False
-    for item in items: # filter those upgrades that are feasible
-        if info.get_cost(item) <= potential:
-            temp.append(item)
-    if len(temp) > 0: # if feasible
-            flag = True
-            best_item = temp[0] # initialize item arbitrarily
-            ratio_best = float(info.get_cps(best_item)) / info.get_cost(best_item)
-            for item in temp:
-                ratio_item = float(info.get_cps(item)) / info.get_cost(item)
-                if ratio_best < ratio_item:
-                    best_item = item
-    if flag:
+    return item_catalog(build_info).best_ratio(potential)
+
+class PurchasePlanner:
+    """
+    Strategy that searches every sequence of up to horizon purchases,
+    scores the end of each sequence by following the best cps/cost
+    ratio rule to the end of the game, and picks the first item of the
+    sequence producing the most cookies by the end of the game.
+
+    A branch is pruned when an upper bound on what it can still produce
+    (see _bound) could not beat the best sequence so far.  Siblings
+    rarely differ by more than a fraction of a percent over long games,
+    so little is pruned there and every turn costs about
+    items ** horizon play-outs of the rest of the game: the planner is
+    meant for short games, which is why run_tournament leaves it out
+    of its default strategies.
+    Node and play-out values are kept in an LRU cache of cache_size
+    entries keyed on (rounded time left, rounded cookies, cps, item
+    costs, depth), which is cleared whenever the planner is handed
+    items with different cps or cost growth. Call it like any other
+    strategy function.
+    """
+
+    def __init__(self, horizon=1, cache_size=100000):
+        self._horizon = horizon
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._nodes = 0
+        self._lookups = 0
+        self._hits = 0
+        self._seconds = 0.0
+        self._item_cps = []
+        self._growths = []
+
+    def get_stats(self):
+        """
+        Return search statistics accumulated over every call so far
+        """
+        nodes_per_second = 0.0
+        if self._seconds > 0:
+            nodes_per_second = self._nodes / self._seconds
+        hit_rate = 0.0
+        if self._lookups > 0:
+            hit_rate = float(self._hits) / self._lookups
+        return {"nodes": self._nodes, "seconds": self._seconds,
+                "nodes_per_second": nodes_per_second,
+                "cache_lookups": self._lookups, "cache_hits": self._hits,
+                "cache_hit_rate": hit_rate, "cache_entries": len(self._cache)}
+
+    def __call__(self, cookies, cps, history, time_left, build_info):
+        """
+        Return the item to buy next, or None
+        """
+        start = time.time()
+        items = build_info.build_items()
+        # per item cost growth, read off a clone so build_info is untouched
+        grown = build_info.clone()
+        growths = []
+        for item in items:
+            grown.update_item(item)
+            growths.append(grown.get_cost(item) / build_info.get_cost(item))
+        item_cps = [build_info.get_cps(item) for item in items]
+        if growths != self._growths or item_cps != self._item_cps:
+            # cached values only hold for the items they were computed with
+            self._cache.clear()
+            self._growths = growths
+            self._item_cps = item_cps
+        costs = tuple(build_info.get_cost(item) for item in items)
+        best_item = None
+        best_value = cps * time_left
+        for idx in self._order(costs):
+            child = self._child(cookies, cps, time_left, costs, idx,
+                                self._horizon, best_value)
+            if child is not None and child > best_value:
+                best_item = items[idx]
+                best_value = child
+        self._seconds += time.time() - start
         return best_item
-    else:
-        return None
+
+    def _order(self, costs):
+        """
+        Item indices by decreasing cps/cost ratio, so good sequences
+        are found early and prune the rest
+        """
+        return sorted(range(len(costs)), key=lambda idx: -self._item_cps[idx] / costs[idx])
+
+    def _bound(self, cookies, cps, time_left, costs):
+        """
+        Upper bound on the cookies produced over time_left, the smaller
+        of two bounds.
+
+        Production P can grow no faster than P' = cps + (cookies + P) *
+        ratio, with ratio the best cps/cost ratio left, since costs only
+        grow. This is tight over short horizons but grows exponentially.
+
+        P is also at most time_left times the final cps, and the cps
+        bought with the cookies + P spent is, for any rate r, at most
+        r * (cookies + P) plus the surplus cps - r * cost of every
+        purchase whose ratio is r or more. Costs grow geometrically, so
+        there are finitely many of those, and for r below 1 / time_left
+        this solves to a finite bound however long the game.
+        """
+        if time_left <= 0:
+            return 0.0
+        ratio = max(self._item_cps[idx] / cost for idx, cost in enumerate(costs))
+        bound = float("inf")
+        if ratio * time_left < 700.0:
+            bound = (cps / ratio + cookies) * math.expm1(ratio * time_left)
+        # lower rates count more purchases but waste less of P, so stop
+        # once a lower rate no longer helps
+        previous = float("inf")
+        for fraction in (0.5, 0.2, 0.1, 0.05, 0.02, 0.01):
+            rate = fraction / time_left
+            surplus = self._surplus(rate, costs)
+            solved = time_left * (cps + surplus + rate * cookies) / (1.0 - fraction)
+            if solved >= previous:
+                break
+            previous = solved
+        return min(bound, previous)
+
+    def _surplus(self, rate, costs):
+        """
+        Total cps - rate * cost over every purchase, now or later, with
+        a cps/cost ratio of at least rate
+        """
+        surplus = 0.0
+        for idx, cost in enumerate(costs):
+            item_cps = self._item_cps[idx]
+            if item_cps < rate * cost:
+                continue
+            growth = self._growths[idx]
+            if growth <= 1.0:
+                return float("inf")
+            # purchases ratio, ratio / growth, ... down to rate
+            count = math.floor(math.log(item_cps / (rate * cost)) / math.log(growth)) + 1
+            surplus += count * item_cps - rate * cost * (growth ** count - 1.0) / (growth - 1.0)
+        return surplus
+
+    def _buy(self, cookies, cps, time_left, costs, idx):
+        """
+        Return (cookies produced while waiting, cookies, cps, time left,
+        costs) after waiting for and buying item idx, or None when it
+        cannot be bought in time
+        """
+        cost = costs[idx]
+        if cookies < cost:
+            wait = math.ceil((cost - cookies) / cps)
+        else:
+            wait = 0.0
+        if wait > time_left:
+            return None
+        new_costs = list(costs)
+        new_costs[idx] = cost * self._growths[idx]
+        return (cps * wait, cookies + cps * wait - cost, cps + self._item_cps[idx],
+                time_left - wait, tuple(new_costs))
+
+    def _child(self, cookies, cps, time_left, costs, idx, depth, best_value):
+        """
+        Cookies produced over time_left when item idx is bought next,
+        or None when it cannot be bought in time or cannot beat
+        best_value
+        """
+        bought = self._buy(cookies, cps, time_left, costs, idx)
+        if bought is None:
+            return None
+        waited, cookies, cps, time_left, costs = bought
+        if waited + self._bound(cookies, cps, time_left, costs) <= best_value:
+            return None
+        return waited + self._value(cookies, cps, time_left, costs, depth - 1)
+
+    def _lookup(self, key):
+        """
+        Return the cached value for key, or None
+        """
+        self._lookups += 1
+        value = self._cache.pop(key, None)
+        if value is not None:
+            self._hits += 1
+            self._cache[key] = value
+        return value
+
+    def _store(self, key, value):
+        """
+        Cache value for key, evicting the least recently used entry
+        """
+        self._cache[key] = value
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _value(self, cookies, cps, time_left, costs, depth):
+        """
+        Most cookies that can be produced over time_left with at most
+        depth more purchases before the play-out
+        """
+        self._nodes += 1
+        if depth <= 0:
+            return self._play_out(cookies, cps, time_left, costs)
+        key = (round(time_left), round(cookies), cps, costs, depth)
+        value = self._lookup(key)
+        if value is not None:
+            return value
+        best_value = cps * time_left
+        for idx in self._order(costs):
+            child = self._child(cookies, cps, time_left, costs, idx, depth, best_value)
+            if child is not None and child > best_value:
+                best_value = child
+        self._store(key, best_value)
+        return best_value
+
+    def _play_out(self, cookies, cps, time_left, costs):
+        """
+        Cookies produced over time_left buying the affordable item with
+        the best cps/cost ratio, as simulate_clicker would, to the end
+        of the game. The value is cached for the starting state and for
+        the state after the first purchase, which is where the next
+        turn's search ends up when the game follows the same item.
+        """
+        key = (round(time_left), round(cookies), cps, costs, 0)
+        value = self._lookup(key)
+        if value is not None:
+            return value
+        idx = self._greedy_item(cookies + cps * time_left, costs)
+        bought = None
+        if idx is not None:
+            bought = self._buy(cookies, cps, time_left, costs, idx)
+        if bought is None:
+            value = cps * time_left
+        else:
+            waited, next_cookies, next_cps, next_time, next_costs = bought
+            next_key = (round(next_time), round(next_cookies), next_cps, next_costs, 0)
+            rest = self._lookup(next_key)
+            if rest is None:
+                rest = self._play_to_end(next_cookies, next_cps, next_time, next_costs)
+                self._store(next_key, rest)
+            value = waited + rest
+        self._store(key, value)
+        return value
+
+    def _greedy_item(self, potential, costs):
+        """
+        Index of the item with the best cps/cost ratio costing at most
+        potential, or None
+        """
+        item_cps = self._item_cps
+        best_idx = None
+        best_ratio = 0.0
+        for idx, cost in enumerate(costs):
+            if cost <= potential and item_cps[idx] / cost > best_ratio:
+                best_idx = idx
+                best_ratio = item_cps[idx] / cost
+        return best_idx
+
+    def _play_to_end(self, cookies, cps, time_left, costs):
+        """
+        Uncached play-out loop behind _play_out
+        """
+        item_cps = self._item_cps
+        growths = self._growths
+        costs = list(costs)
+        produced = 0.0
+        while True:
+            best_idx = self._greedy_item(cookies + cps * time_left, costs)
+            if best_idx is None:
+                break
+            cost = costs[best_idx]
+            if cookies < cost:
+                wait = math.ceil((cost - cookies) / cps)
+            else:
+                wait = 0.0
+            if wait > time_left:
+                break
+            produced += cps * wait
+            cookies += cps * wait - cost
+            time_left -= wait
+            cps += item_cps[best_idx]
+            costs[best_idx] = cost * growths[best_idx]
+        return produced + cps * time_left
     
 def run_strategy(strategy_name, time, strategy):
     """
     Run a simulation for the given time with one strategy.
     """
     state = simulate_clicker(provided.BuildInfo(), time, strategy)
-    print
-    print strategy_name, ":", state
+    print("")
+    print(strategy_name + " : " + str(state))
 
     # Plot total cookies over time
 
     # Uncomment out the lines below to see a plot of total cookies vs. time
     # Be sure to allow popups, if you do want to see it
 
+    import simpleplot
     history = state.get_history()
     history = [(item[0], item[3]) for item in history]
     simpleplot.plot_lines(strategy_name, 1000, 400, 'Time', 'Total Cookies', [history], True)
 
+# (name, strategy) pairs run by run() and, by default, run_tournament()
+STRATEGIES = [("Cursor", strategy_cursor_broken),
+              ("None", strategy_none),
+              ("Cheap", strategy_cheap),
+              ("Expensive", strategy_expensive),
+              ("Best", strategy_best)]
+
+TOURNAMENT_FIELDS = ["strategy", "build_info", "duration", "total_cookies",
+                     "cps", "purchases", "counts", "seconds"]
+
+def play_match(match):
+    """
+    Play one tournament match (strategy name, strategy, build info
+    name, build info, duration), for a process pool
+    Returns a dictionary keyed by TOURNAMENT_FIELDS
+    """
+    strategy_name, strategy, info_name, build_info, duration = match
+    start = time.time()
+    state = simulate_clicker(build_info, duration, strategy, False)
+    history = state.get_history_view()
+    return {"strategy": strategy_name, "build_info": info_name,
+            "duration": duration, "total_cookies": state.get_total_cookies(),
+            "cps": state.get_cps(), "purchases": len(history) - 1,
+            "counts": history.get_counts(), "seconds": time.time() - start}
+
+def run_tournament(strategies=None, build_infos=None, durations=(SIM_TIME,),
+                   processes=None, chunksize=1):
+    """
+    Play every (name, strategy) pair against every (name, BuildInfo)
+    pair for every duration over a pool of worker processes, one per
+    core by default, or in this process when processes is 0
+    Strategies must be picklable: module level functions, or
+    functools.partial objects wrapping them.  PurchasePlanner is not
+    among the defaults, as it is too slow for SIM_TIME games; pass it
+    in for short durations
+    Returns the play_match results in grid order
+    """
+    if strategies is None:
+        strategies = STRATEGIES
+    if build_infos is None:
+        build_infos = [("Default", provided.BuildInfo())]
+    matches = [(strategy_name, strategy, info_name, build_info, duration)
+               for strategy_name, strategy in strategies
+               for info_name, build_info in build_infos
+               for duration in durations]
+    if processes == 0:
+        return [play_match(match) for match in matches]
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = list(pool.imap(play_match, matches, chunksize))
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+def rank_strategies(results):
+    """
+    Rank the strategies of a tournament: within each (build info,
+    duration) pairing the strategies are ranked 1, 2, ... by final
+    total cookies, and strategies are ordered by their mean rank
+    Returns a list of dictionaries with the strategy, mean_rank, wins
+    and mean_total_cookies
+    """
+    pairings = {}
+    for record in results:
+        key = (record["build_info"], record["duration"])
+        pairings.setdefault(key, []).append(record)
+    ranks = {}
+    wins = {}
+    totals = {}
+    for records in pairings.values():
+        records = sorted(records, key=lambda record: -record["total_cookies"])
+        for rank, record in enumerate(records):
+            name = record["strategy"]
+            ranks.setdefault(name, []).append(rank + 1)
+            totals.setdefault(name, []).append(record["total_cookies"])
+            wins[name] = wins.get(name, 0) + (rank == 0)
+    ranking = [{"strategy": name, "mean_rank": float(sum(ranks[name])) / len(ranks[name]),
+                "wins": wins[name],
+                "mean_total_cookies": sum(totals[name]) / len(totals[name])}
+               for name in ranks]
+    ranking.sort(key=lambda entry: (entry["mean_rank"], -entry["mean_total_cookies"]))
+    return ranking
+
+def write_tournament(results, path):
+    """
+    Save run_tournament results as JSON, or as CSV when the path ends
+    in .csv (with the purchase counts as a JSON column)
+    """
+    import csv
+    with open(path, "w") as out:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(out, TOURNAMENT_FIELDS)
+            writer.writeheader()
+            for record in results:
+                row = dict(record)
+                row["counts"] = json.dumps(record["counts"], sort_keys=True)
+                writer.writerow(row)
+        else:
+            json.dump(results, out, indent=1)
+
+# strategies simulate_clicker_batch plays, by their code in the batch
+BATCH_STRATEGIES = ["cheap", "expensive", "best"]
+
+# games simulate_clicker_batch plays in lockstep at a time: the larger,
+# the less Python overhead per purchase, the smaller, the more of the
+# arrays stay in cache
+BATCH_BLOCK = 16384
+
+def simulate_clicker_batch(build_info, duration, strategy_codes, growths, cps_scales,
+                           processes=0):
+    """
+    Play many games in lockstep with NumPy, one per entry of the equal
+    length arrays strategy_codes (indices into BATCH_STRATEGIES),
+    growths (cost growth factor per purchase) and cps_scales (factor
+    applied to the cps of every item of build_info).  Each game plays
+    out exactly as simulate_clicker with the matching strategy would.
+    Games are played in blocks of up to BATCH_BLOCK games of one
+    strategy and similar growth, in this process when processes is 0,
+    otherwise over a pool of that many worker processes (one per core
+    when None).
+    Returns a dictionary of arrays: "total_cookies", "cookies", "cps",
+    "purchases", and "counts" with one column per build_info item
+    """
+    import numpy
+    items = build_info.build_items()
+    strategy_codes = numpy.asarray(strategy_codes, dtype=numpy.int64)
+    growths = numpy.asarray(growths, dtype=numpy.float64)
+    cps_scales = numpy.asarray(cps_scales, dtype=numpy.float64)
+    num_games = len(strategy_codes)
+    results = {"total_cookies": numpy.zeros(num_games), "cookies": numpy.zeros(num_games),
+               "cps": numpy.zeros(num_games),
+               "counts": numpy.zeros((num_games, len(items)), dtype=numpy.int64)}
+    # similar growths end after similar numbers of purchases, so sorted
+    # blocks shed few finished games before their last purchase
+    order = numpy.lexsort((growths, strategy_codes))
+    blocks = []
+    for first in range(0, num_games, BATCH_BLOCK):
+        ids = order[first:first + BATCH_BLOCK]
+        for code in numpy.unique(strategy_codes[ids]):
+            blocks.append(ids[strategy_codes[ids] == code])
+    tasks = [(build_info, duration, int(strategy_codes[block[0]]), growths[block],
+              cps_scales[block]) for block in blocks]
+    if processes == 0:
+        outcomes = [play_batch_block(task) for task in tasks]
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        try:
+            outcomes = list(pool.imap(play_batch_block, tasks))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    for block, outcome in zip(blocks, outcomes):
+        for name, values in outcome.items():
+            results[name][block] = values
+    results["purchases"] = results["counts"].sum(axis=1)
+    return results
+
+def play_batch_block(task):
+    """
+    Play one block of simulate_clicker_batch games (build info,
+    duration, strategy code, growths, cps scales), for a process pool
+    Returns a dictionary of the block's "total_cookies", "cookies",
+    "cps" and "counts", in the order of its games
+    """
+    import numpy
+    build_info, duration, code, growths, cps_scales = task
+    items = build_info.build_items()
+    results = {"total_cookies": numpy.zeros(len(growths)), "cookies": numpy.zeros(len(growths)),
+               "cps": numpy.zeros(len(growths)),
+               "counts": numpy.zeros((len(growths), len(items)), dtype=numpy.int64)}
+    ids = numpy.arange(len(growths))
+    # item-major [item, game] arrays, so choosing an item reduces over
+    # contiguous rows instead of running a short loop per game
+    item_cps = numpy.outer([build_info.get_cps(item) for item in items], cps_scales)
+    costs = numpy.repeat([[build_info.get_cost(item)] for item in items], len(ids), axis=1)
+    costs = costs.astype(numpy.float64)
+    if code == 2:
+        # cps/cost ratios, updated as costs grow
+        ratios = item_cps / costs
+    cookies = numpy.zeros(len(ids))
+    total = numpy.zeros(len(ids))
+    now = numpy.zeros(len(ids))
+    cps = numpy.ones(len(ids))
+    counts = numpy.zeros(costs.shape)
+    live = numpy.ones(len(ids), dtype=bool)
+    games = numpy.arange(len(ids))
+    while len(ids):
+        time_left = duration - now
+        potential = cookies + cps * time_left
+        if code == 0:
+            values = costs
+            best = costs.min(axis=0)
+        else:
+            if code == 1:
+                values = costs.copy()
+            else:
+                values = ratios.copy()
+            numpy.copyto(values, -numpy.inf, where=costs > potential)
+            best = values.max(axis=0)
+        choice = _first_index(values, best)
+        # flat indices of the chosen items, as 1d indexing beats 2d
+        flat = choice * len(ids) + games
+        cost = costs.reshape(-1)[flat]
+        wait = numpy.maximum(numpy.ceil((cost - cookies) / cps), 0.0)
+        going = (cost <= potential) & (wait <= time_left) & live
+        wait *= going
+        produced = cps * wait
+        cookies += produced
+        total += produced
+        now += wait
+        bought = going & (cost <= cookies)
+        cookies -= cost * bought
+        chosen_cps = item_cps.reshape(-1)[flat]
+        cps += chosen_cps * bought
+        counts.reshape(-1)[flat] += bought
+        # a finished game's costs no longer matter, so grow them all
+        cost *= growths
+        costs.reshape(-1)[flat] = cost
+        if code == 2:
+            ratios.reshape(-1)[flat] = chosen_cps / cost
+        live &= going
+        if numpy.count_nonzero(live) * 8 < len(ids) * 7:
+            # finished games wait out the rest of the game and leave
+            done = ~live
+            final = numpy.maximum(duration - now[done], 0.0) * cps[done]
+            finished = ids[done]
+            results["total_cookies"][finished] = total[done] + final
+            results["cookies"][finished] = cookies[done] + final
+            results["cps"][finished] = cps[done]
+            results["counts"][finished] = counts[:, done].T
+            ids, growths = ids[live], growths[live]
+            # compress keeps the item-major arrays contiguous, so the
+            # reshape(-1) views above write through
+            item_cps = numpy.compress(live, item_cps, axis=1)
+            costs = numpy.compress(live, costs, axis=1)
+            counts = numpy.compress(live, counts, axis=1)
+            if code == 2:
+                ratios = numpy.compress(live, ratios, axis=1)
+            cookies, total, now, cps = cookies[live], total[live], now[live], cps[live]
+            live = live[live]
+            games = games[:len(ids)]
+    return results
+
+def _first_index(values, best):
+    """
+    Index along axis 0 of the first entry of each column of values
+    equal to best, the column minimum or maximum, which is where
+    argmin / argmax break ties, like the linear scans of the strategy
+    functions
+    """
+    import numpy
+    if len(values) > 127:
+        return (values == best).argmax(axis=0)
+    # the largest of len - idx over the tied entries, in small ints
+    weights = numpy.arange(len(values), 0, -1, dtype=numpy.int8)
+    tied = ((values == best) * weights[:, None]).max(axis=0)
+    return len(values) - tied.astype(numpy.int64)
+
+def sweep_clicker(build_info, growths, cps_scales, duration=SIM_TIME,
+                  strategies=None, processes=0):
+    """
+    Play every strategy named in strategies (all of BATCH_STRATEGIES
+    by default) for every pair of a cost growth factor from growths
+    and an item cps scale from cps_scales, with simulate_clicker_batch
+    (over processes worker processes unless 0)
+    Returns a dictionary of result matrices indexed [strategy, growth,
+    cps scale]: "total_cookies", "cps" and "purchases"
+    """
+    import numpy
+    if strategies is None:
+        strategies = BATCH_STRATEGIES
+    growths = numpy.asarray(growths, dtype=numpy.float64)
+    cps_scales = numpy.asarray(cps_scales, dtype=numpy.float64)
+    codes = [BATCH_STRATEGIES.index(name) for name in strategies]
+    shape = (len(codes), len(growths), len(cps_scales))
+    code_grid, growth_grid, scale_grid = numpy.meshgrid(
+        codes, growths, cps_scales, indexing="ij")
+    results = simulate_clicker_batch(build_info, duration, code_grid.ravel(),
+                                     growth_grid.ravel(), scale_grid.ravel(), processes)
+    return {"strategies": list(strategies), "growths": growths,
+            "cps_scales": cps_scales,
+            "total_cookies": results["total_cookies"].reshape(shape),
+            "cps": results["cps"].reshape(shape),
+            "purchases": results["purchases"].reshape(shape)}
+
+def random_sweep(build_info, samples, growth_range=(1.05, 1.3),
+                 scale_range=(0.5, 2.0), duration=SIM_TIME, strategies=None, seed=0,
+                 processes=0):
+    """
+    Monte Carlo sensitivity analysis: draw samples (growth, cps scale)
+    pairs uniformly from the given ranges and play every strategy on
+    each of them, with simulate_clicker_batch (over processes worker
+    processes unless 0)
+    Returns a dictionary with the sampled "growths" and "cps_scales"
+    and result matrices indexed [strategy, sample]
+    """
+    import numpy
+    if strategies is None:
+        strategies = BATCH_STRATEGIES
+    rng = numpy.random.RandomState(seed)
+    growths = rng.uniform(growth_range[0], growth_range[1], samples)
+    cps_scales = rng.uniform(scale_range[0], scale_range[1], samples)
+    codes = numpy.repeat([BATCH_STRATEGIES.index(name) for name in strategies], samples)
+    repeats = len(strategies)
+    results = simulate_clicker_batch(build_info, duration, codes,
+                                     numpy.tile(growths, repeats),
+                                     numpy.tile(cps_scales, repeats), processes)
+    shape = (repeats, samples)
+    return {"strategies": list(strategies), "growths": growths,
+            "cps_scales": cps_scales,
+            "total_cookies": results["total_cookies"].reshape(shape),
+            "cps": results["cps"].reshape(shape),
+            "purchases": results["purchases"].reshape(shape)}
+
 def run():
     """
     Run the simulator.
     """    
-    run_strategy("Cursor", SIM_TIME, strategy_cursor_broken)
-    run_strategy("None", SIM_TIME, strategy_none)
-    run_strategy("Cheap", SIM_TIME, strategy_cheap)
-    run_strategy("Expensive", SIM_TIME, strategy_expensive)
-    run_strategy("Best", SIM_TIME, strategy_best)
+    for strategy_name, strategy in STRATEGIES:
+        run_strategy(strategy_name, SIM_TIME, strategy)
     
 #run()
 